@@ -0,0 +1,229 @@
+"""
+Alert pipeline for signal transitions.
+
+`SignalTracker` turns the per-refresh signal label into debounced, de-duplicated
+transition events. `AlertDispatcher` queues them and each sink drains its own
+queue on a worker thread, so a slow webhook never delays the next refresh.
+"""
+import json
+import logging
+import os
+import platform
+import queue
+import subprocess
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Signals worth interrupting someone for
+ACTIONABLE = ("STRONG BUY", "STRONG SELL", "SCALP BUY", "SCALP SELL", "BUY CALL", "BUY PUT")
+
+
+class SignalTracker:
+    """
+    Confirms a new signal only after it has been seen `debounce` refreshes
+    in a row, and suppresses repeats of the same signal within `cooldown`
+    seconds (dedup across flip-flops such as BUY -> WAIT -> BUY).
+    """
+
+    def __init__(self, debounce=2, cooldown=300, watch=ACTIONABLE):
+        self.debounce = debounce
+        self.cooldown = cooldown
+        self.watch = watch
+        self.current = None
+        self._candidate = None
+        self._streak = 0
+        self._last_sent = {}
+
+    def update(self, signal, ts=None, **context):
+        """Returns an event dict when an alert should fire, else None."""
+        ts = time.time() if ts is None else ts
+
+        if signal == self.current:
+            self._candidate, self._streak = None, 0
+            return None
+
+        if signal == self._candidate:
+            self._streak += 1
+        else:
+            self._candidate, self._streak = signal, 1
+        if self._streak < self.debounce:
+            return None
+
+        previous, self.current = self.current, signal
+        self._candidate, self._streak = None, 0
+
+        if self.watch and not any(w in signal for w in self.watch):
+            return None
+        if ts - self._last_sent.get(signal, float("-inf")) < self.cooldown:
+            return None
+        self._last_sent[signal] = ts
+
+        return {"time": ts, "signal": signal, "previous": previous, **context}
+
+
+def format_event(event):
+    parts = [f"{event['signal']}"]
+    if event.get('previous'):
+        parts.append(f"(was {event['previous']})")
+    for key in ("ltp", "strike", "app"):
+        if event.get(key) is not None:
+            parts.append(f"{key}={event[key]}")
+    return " ".join(parts)
+
+
+# ---------------------------------------------------------
+# SINKS
+# ---------------------------------------------------------
+class WebhookSink:
+    """POSTs the event as JSON."""
+    name = "webhook"
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, event):
+        body = json.dumps({**event, "text": format_event(event)}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class TelegramSink:
+    """Telegram Bot API `sendMessage`; `base_url` can point at any compatible bot API."""
+    name = "telegram"
+
+    def __init__(self, token, chat_id, base_url="https://api.telegram.org", timeout=5):
+        self.url = f"{base_url.rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.timeout = timeout
+
+    def send(self, event):
+        body = urllib.parse.urlencode({"chat_id": self.chat_id, "text": format_event(event)}).encode("utf-8")
+        with urllib.request.urlopen(self.url, data=body, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class DesktopSink:
+    """Native notification via notify-send (Linux) or osascript (macOS)."""
+    name = "desktop"
+
+    def send(self, event):
+        text = format_event(event)
+        if platform.system() == "Darwin":
+            cmd = ["osascript", "-e", f'display notification "{text}" with title "Nifty Signal"']
+        else:
+            cmd = ["notify-send", "Nifty Signal", text]
+        subprocess.run(cmd, check=False, timeout=5, capture_output=True)
+
+
+class FileSink:
+    """Appends one JSON line per event."""
+    name = "file"
+
+    def __init__(self, path="alerts.jsonl"):
+        self.path = path
+
+    def send(self, event):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def sinks_from_config(cfg):
+    """
+    Builds sinks from a mapping such as st.secrets["alerts"]:
+      webhook_url, telegram_token + telegram_chat_id, desktop = true, file = "alerts.jsonl"
+    """
+    sinks = []
+    if cfg.get("webhook_url"):
+        sinks.append(WebhookSink(cfg["webhook_url"]))
+    if cfg.get("telegram_token") and cfg.get("telegram_chat_id"):
+        sinks.append(TelegramSink(cfg["telegram_token"], cfg["telegram_chat_id"]))
+    if cfg.get("desktop"):
+        sinks.append(DesktopSink())
+    if cfg.get("file"):
+        sinks.append(FileSink(cfg["file"]))
+    return sinks
+
+
+# ---------------------------------------------------------
+# DISPATCH
+# ---------------------------------------------------------
+class AlertDispatcher:
+    """
+    One bounded queue + daemon worker per sink. `publish` never blocks: if a
+    sink has fallen behind, its oldest pending alert is dropped.
+    """
+
+    def __init__(self, sinks, maxsize=100, retries=2, backoff=1.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._queues = []
+        for sink in sinks:
+            q = queue.Queue(maxsize=maxsize)
+            threading.Thread(target=self._drain, args=(sink, q), daemon=True,
+                             name=f"alert-{getattr(sink, 'name', 'sink')}").start()
+            self._queues.append(q)
+
+    def publish(self, event):
+        for q in self._queues:
+            while True:
+                try:
+                    q.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                        q.task_done()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _drain(self, sink, q):
+        while True:
+            event = q.get()
+            try:
+                for attempt in range(self.retries + 1):
+                    try:
+                        sink.send(event)
+                        self.sent += 1
+                        break
+                    except Exception as e:
+                        if attempt == self.retries:
+                            self.failed += 1
+                            metrics.inc("nom_alert_failures_total", sink=getattr(sink, 'name', 'sink'))
+                            log.warning("Alert sink %s failed: %s", getattr(sink, 'name', sink), e)
+                        else:
+                            time.sleep(self.backoff * (2 ** attempt))
+            finally:
+                q.task_done()
+
+    def join(self):
+        """Blocks until every queued alert has been handled (used on shutdown)."""
+        for q in self._queues:
+            q.join()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher(cfg=None):
+    """Process-wide dispatcher, created once so Streamlit reruns reuse the workers."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            cfg = dict(cfg or {})
+            if not cfg and os.environ.get("NOM_ALERT_WEBHOOK"):
+                cfg["webhook_url"] = os.environ["NOM_ALERT_WEBHOOK"]
+            _dispatcher = AlertDispatcher(sinks_from_config(cfg))
+        return _dispatcher
@@ -0,0 +1,143 @@
+"""
+Streaming per-strike anomaly detection on OI and volume flow.
+
+Each snapshot's per-strike flow (change since the previous poll, per
+minute, so adaptive poll spacing does not skew it) is scored against an
+EWMA mean/variance per strike and series. A large single-poll z-score is a
+burst; a two-sided CUSUM over the z-scores catches sustained build-ups or
+unwinds that no single poll would flag. Everything is a (series x strikes)
+array update, so a snapshot costs O(strikes), and state stays bounded: one
+row per listed strike plus the last `max_events` events.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+SERIES = ("ce_oi", "pe_oi", "ce_volume", "pe_volume")
+LABELS = {"ce_oi": "CE OI", "pe_oi": "PE OI", "ce_volume": "CE Volume", "pe_volume": "PE Volume"}
+VOLUME_ROWS = np.array([s.endswith("volume") for s in SERIES])
+
+
+class OIFlowDetector:
+    def __init__(self, halflife=20, z_threshold=5.0, cusum_k=0.5, cusum_h=10.0, warmup=20,
+                 variance_floor=0.5, max_events=200):
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.z_threshold = z_threshold
+        self.cusum_k = cusum_k              # Slack per poll, in sd
+        self.cusum_h = cusum_h              # Alarm level, in sd
+        self.warmup = warmup                # Polls per strike before it can alarm
+        self.variance_floor = variance_floor  # Fraction of the chain's median variance
+        self.events = deque(maxlen=max_events)
+        self.reset()
+
+    def reset(self, key=None):
+        """Forgets all per-strike state and events, e.g. when the chain being watched changes."""
+        self.key = key
+        self.events.clear()
+        self.strikes = np.empty(0)
+        self._ts = None
+        self._last = np.empty((len(SERIES), 0))
+        self._mean = np.empty((len(SERIES), 0))
+        self._var = np.empty((len(SERIES), 0))
+        self._pos = np.empty((len(SERIES), 0))
+        self._neg = np.empty((len(SERIES), 0))
+        self._count = np.empty(0, dtype=np.int64)
+
+    def _remap(self, strikes):
+        """Carries per-strike state onto a new strike grid; new strikes start fresh."""
+        if len(strikes) == len(self.strikes) and np.array_equal(strikes, self.strikes):
+            return
+        pos = np.clip(np.searchsorted(self.strikes, strikes), 0, max(len(self.strikes) - 1, 0))
+        hit = (self.strikes[pos] == strikes) if len(self.strikes) else np.zeros(len(strikes), dtype=bool)
+
+        def carry(old, fill):
+            new = np.full(old.shape[:-1] + (len(strikes),), fill, dtype=old.dtype)
+            new[..., hit] = old[..., pos[hit]]
+            return new
+
+        self._last = carry(self._last, np.nan)
+        self._mean = carry(self._mean, 0.0)
+        self._var = carry(self._var, 0.0)
+        self._pos = carry(self._pos, 0.0)
+        self._neg = carry(self._neg, 0.0)
+        self._count = carry(self._count, 0)
+        self.strikes = np.array(strikes, dtype=float)
+
+    def update(self, ts, snap, key=None):
+        """
+        Folds in one snapshot (`ts` epoch seconds); returns this poll's events.
+        `key` identifies the chain (e.g. (security id, expiry); default: the
+        snapshot's expiry). A new key resets the detector, so the OI gap
+        between two unrelated chains is never scored as one poll's flow.
+        """
+        key = snap.expiry if key is None else key
+        if key != self.key:
+            self.reset(key)
+        self._remap(snap.strikes)
+        levels = np.vstack([getattr(snap, name) for name in SERIES])
+        if self._ts is None or ts <= self._ts:
+            self._ts, self._last = ts, levels
+            return []
+
+        flow = (levels - self._last) * (60 / (ts - self._ts))
+        self._ts, self._last = ts, levels
+        # New strikes have no previous level; falling cumulative volume is a day rollover
+        valid = np.isfinite(flow) & ~(VOLUME_ROWS[:, None] & (flow < 0))
+        flow = np.where(valid, flow, 0.0)
+
+        # Bias-corrected EWMA moments (both start at 0); quiet strikes borrow
+        # a floor from the chain's median variance
+        seen = np.maximum(1 - (1 - self.alpha) ** self._count, 1e-9)
+        mean, var = self._mean / seen, self._var / seen
+        floor = self.variance_floor * np.median(var, axis=1, keepdims=True) if var.shape[1] else 0
+        z = (flow - mean) / np.sqrt(np.maximum(var, floor) + 1e-9)
+        warm = valid & (self._count >= self.warmup)
+        z = np.where(warm, z, 0.0)
+
+        # EWMA mean / variance (West's incremental form), valid cells only
+        diff = flow - mean
+        a = np.where(valid, self.alpha, 0.0)
+        self._mean += a * (flow - self._mean)
+        self._var = (1 - a) * self._var + a * (1 - self.alpha) * diff * diff
+        self._count += valid.any(axis=0)
+
+        # Two-sided CUSUM on clipped z, so one outlier cannot carry an alarm alone
+        zc = np.clip(z, -self.cusum_h, self.cusum_h)
+        self._pos = np.maximum(0, self._pos + zc - self.cusum_k)
+        self._neg = np.maximum(0, self._neg - zc - self.cusum_k)
+        self._neg[VOLUME_ROWS] = 0
+
+        burst = warm & (np.abs(z) >= self.z_threshold) & ~(VOLUME_ROWS[:, None] & (z < 0))
+        build = warm & (self._pos >= self.cusum_h)
+        unwind = warm & (self._neg >= self.cusum_h)
+
+        events = []
+        for kind, mask in (("burst", burst), ("build-up", build & ~burst), ("unwind", unwind & ~burst)):
+            for row, col in zip(*np.nonzero(mask)):
+                events.append({
+                    "ts": ts, "strike": float(self.strikes[col]), "series": LABELS[SERIES[row]],
+                    "kind": kind, "z": round(float(z[row, col]), 1), "flow_per_min": round(float(flow[row, col]), 1),
+                })
+        self._pos[build] = 0
+        self._neg[unwind] = 0
+        events.sort(key=lambda e: -abs(e["z"]))
+        self.events.extend(events)
+        return events
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.strikes, self._last, self._mean, self._var,
+                                       self._pos, self._neg, self._count))
+
+
+def describe(event):
+    """Short panel text, e.g. 'PE OI burst @ 24200 (z 5.3)'."""
+    return f"{event['series']} {event['kind']} @ {event['strike']:.0f} (z {event['z']:+.1f})"
+
+
+def frame(events, tz):
+    """Events as a table, latest first, with local clock times."""
+    df = pd.DataFrame(list(events)[::-1], columns=["ts", "strike", "series", "kind", "z", "flow_per_min"])
+    df["ts"] = pd.to_datetime(df["ts"], unit="s", utc=True).dt.tz_convert(tz).dt.strftime("%H:%M:%S")
+    return df.rename(columns={"ts": "Time", "strike": "Strike", "series": "Series", "kind": "Kind",
+                              "flow_per_min": "Flow/min"})
@@ -5,6 +5,19 @@ import time
 import pandas as pd
 import numpy as np
 import pytz
+from bars import BarAggregator
+import metrics
+import profiler
+import alerts
+import strategies
+import iv_surface
+import resilient
+import scheduler
+import snapbus
+import store
+import anomaly
+from chain import parse_chain
+from strategies import Features
 
 # ---------------------------------------------------------
 # 1. PAGE CONFIG & SESSION
@@ -21,6 +34,10 @@ if 'log_df' not in st.session_state:
     ])
 if 'historical_loaded' not in st.session_state:
     st.session_state.historical_loaded = False
+if 'bars' not in st.session_state:
+    st.session_state.bars = BarAggregator()
+if 'alert_tracker' not in st.session_state:
+    st.session_state.alert_tracker = alerts.SignalTracker()
 
 # ---------------------------------------------------------
 # 2. API CONNECTION
@@ -36,14 +53,22 @@ except:
 SECURITY_ID = "13"          # NIFTY (String for data APIs)
 EXCHANGE_SEGMENT = "IDX_I" 
 INSTRUMENT_TYPE = "INDEX"
+TREND_TIMEFRAME = 3         # Minutes per bar for EMA-9 (>= live poll spacing)
 dhan = dhanhq(CLIENT_ID, ACCESS_TOKEN)
+metrics.start_server()
+OC_LIMITER = resilient.get_limiter("option_chain", iv_surface.UPSTREAM_SPACING)
+
+if 'scheduler' not in st.session_state:
+    st.session_state.scheduler = scheduler.Scheduler(bar_minutes=TREND_TIMEFRAME)
+if 'anomalies' not in st.session_state:
+    st.session_state.anomalies = anomaly.OIFlowDetector()
 
 # ---------------------------------------------------------
 # 3. CORE LOGIC
 # ---------------------------------------------------------
 def fetch_historical_trend():
     """
-    Fetches intraday data to backfill EMA-9 Trend immediately.
+    Fetches intraday minute candles to backfill the EMA-9 bars immediately.
     FIXED: Added from_date/to_date arguments required by Dhan API.
     """
     try:
@@ -51,7 +76,8 @@ def fetch_historical_trend():
         to_date = datetime.now().date().strftime("%Y-%m-%d")
         from_date = (datetime.now() - timedelta(days=3)).date().strftime("%Y-%m-%d")
         
-        resp = dhan.intraday_minute_data(
+        resp = metrics.call(
+            "intraday_minute_data", dhan.intraday_minute_data,
             security_id=SECURITY_ID,
             exchange_segment=EXCHANGE_SEGMENT,
             instrument_type=INSTRUMENT_TYPE,
@@ -65,23 +91,24 @@ def fetch_historical_trend():
         data = resp['data']
         if not data: return None
 
-        df_hist = pd.DataFrame(data)
-        
-        # Calculate EMA-9
-        df_hist['EMA_9'] = df_hist['close'].ewm(span=9, adjust=False).mean()
-        
-        return df_hist['EMA_9'].iloc[-1]
+        return pd.DataFrame(data)
 
     except Exception as e:
         # Fail silently or show small warning
         print(f"Historical fetch failed: {e}")
         return None
 
-def get_nearest_expiry():
+def get_expiries():
+    """All listed expiries (YYYY-MM-DD), nearest first; fetched once per session per day."""
+    today = datetime.now(IST).date()
+    cached = st.session_state.get('expiries')
+    if cached and cached[0] == today:
+        return cached[1]
     try:
         # Option Chain API often expects int for security_id
-        resp = dhan.expiry_list(int(SECURITY_ID), EXCHANGE_SEGMENT)
-        if resp['status'] != 'success': return None
+        resp = resilient.get_fetcher("expiry_list", fetch_expiry_list, deadline=10).fetch(
+            int(SECURITY_ID), EXCHANGE_SEGMENT)["data"]
+        if not resp: return []
         data = resp['data']
         dates = list(data) if isinstance(data, list) else []
         if isinstance(data, dict):
@@ -89,121 +116,148 @@ def get_nearest_expiry():
                  if isinstance(val, list): dates = val; break
              if not dates: dates = list(data.keys())
         
-        valid = sorted([d for d in dates if str(d).count('-')==2])
-        return valid[0] if valid else None
-    except: return None
+        dates = sorted([d for d in dates if str(d).count('-')==2])
+        if dates:
+            st.session_state.expiries = (today, dates)
+        return dates
+    except: return []
 
-def analyze_market():
-    # --- 0. PRE-LOAD TREND (ONE TIME) ---
-    current_ema = None
-    if not st.session_state.historical_loaded:
-        with st.spinner("Fetching historical trend..."):
-            hist_ema = fetch_historical_trend()
-            if hist_ema:
-                st.session_state.historical_loaded = True
-                current_ema = hist_ema
-    
-    expiry = get_nearest_expiry()
-    if not expiry: return None
+def fetch_expiry_list(security_id, segment):
+    return metrics.call("expiry_list", dhan.expiry_list, security_id, segment)
 
-    # Fetch Option Chain
-    oc_resp = dhan.option_chain(int(SECURITY_ID), EXCHANGE_SEGMENT, expiry)
-    if oc_resp['status'] != 'success': return None
+def fetch_option_chain(security_id, segment, expiry):
+    return metrics.call("option_chain", dhan.option_chain, security_id, segment, expiry)
 
-    raw = oc_resp.get('data', {})
+def get_nearest_expiry():
+    valid = get_expiries()
+    return valid[0] if valid else None
+
+def fetch_chain(expiry):
+    """(oc, ltp) for one expiry, used by the background IV surface builder (which spaces the calls)."""
+    resp = fetch_option_chain(int(SECURITY_ID), EXCHANGE_SEGMENT, expiry)
+    if resp.get('status') != 'success': return None
+    raw = resp.get('data', {})
     final_data = raw.get('data', raw) if 'data' in raw else raw
     oc = final_data.get('oc', {})
     ltp = final_data.get('last_price', 0)
+    return (oc, ltp) if oc and ltp else None
 
-    if ltp == 0 or not oc: return None
-
-    # --- 1. PROCESS OI DATA ---
-    strikes = sorted([(float(k), k) for k in oc.keys()])
-    atm_tuple = min(strikes, key=lambda x: abs(x[0] - ltp))
-    atm_idx = strikes.index(atm_tuple)
-    
-    selected = strikes[max(0, atm_idx - 5) : min(len(strikes), atm_idx + 6)]
-
-    total_ce_chg = 0
-    total_pe_chg = 0
-
-    for val, key in selected:
-        d = oc[key]
-        ce_chg = d.get('ce', {}).get('oi', 0) - d.get('ce', {}).get('previous_oi', 0)
-        pe_chg = d.get('pe', {}).get('oi', 0) - d.get('pe', {}).get('previous_oi', 0)
-        total_ce_chg += ce_chg
-        total_pe_chg += pe_chg
-
-    net_diff = total_pe_chg - total_ce_chg 
+def read_bus():
+    """(snap, status) from the shared-memory bus when a publisher is running (NOM_SNAPBUS)."""
+    bus = snapbus.get_reader()
+    snap = bus.read(security_id=int(SECURITY_ID)) if bus else None
+    if snap is None: return None
+    age = time.time() - snap.timestamp
+    return snap, {"stale": age > snapbus.STALE_AFTER, "age": age}
 
-    # --- 2. UPDATE LOGS & INDICATORS ---
-    timestamp = datetime.now(IST).strftime("%H:%M:%S")
-    
-    temp_df = st.session_state.log_df.copy()
-    new_row = pd.DataFrame([{"Timestamp": timestamp, "Spot": ltp, "Net Diff": net_diff}])
-    temp_df = pd.concat([temp_df, new_row], ignore_index=True)
-    
-    # A. Calculate EMA-9
-    # Prioritize historical seed if we have little live data
-    if len(temp_df) < 9 and current_ema:
-        k = 2 / (9 + 1)
-        calculated_ema = (ltp * k) + (current_ema * (1 - k))
-    else:
-        calculated_ema = temp_df['Spot'].ewm(span=9, adjust=False).mean().iloc[-1]
+def analyze_market():
+    # --- 0. PRE-LOAD TREND (ONE TIME) ---
+    bars = st.session_state.bars
+    if not st.session_state.historical_loaded:
+        with st.spinner("Fetching historical trend..."):
+            df_hist = fetch_historical_trend()
+            if df_hist is not None and not df_hist.empty:
+                bars.backfill(df_hist)
+                st.session_state.historical_loaded = True
     
-    trend = "BULLISH" if ltp > calculated_ema else "BEARISH"
-
-    # B. Calculate OI Momentum (Slope)
-    lookback = 3
-    if len(temp_df) > lookback:
-        past_diff = temp_df.iloc[-(lookback+1)]['Net Diff']
-        oi_slope = net_diff - past_diff
+    # Shared-memory bus first: the publisher process already polled upstream
+    from_bus = read_bus()
+    if from_bus:
+        snap, fetched = from_bus
+        expiry = snap.expiry
+        # Stale, or analysed on an earlier run: nothing new to fold into the bars
+        seen = snap.bus_seq == st.session_state.get('bus_seq')
+        if (fetched["stale"] or seen) and 'last_data' in st.session_state:
+            return {**st.session_state.last_data, "stale": fetched["stale"], "age": fetched["age"]}
+        st.session_state.bus_seq = snap.bus_seq
     else:
-        oi_slope = 0 
-
-    slope_status = "POSITIVE" if oi_slope > 0 else "NEGATIVE"
-
-    # --- 3. SIGNAL LOGIC ---
-    signal = "WAIT ⏳"
-    color = "gray"
-
-    if oi_slope == 0:
-        signal = "Building Momentum... (Wait 3m)"
-    elif trend == "BULLISH" and slope_status == "POSITIVE":
-        signal = "STRONG BUY 🚀"
-        color = "green"
-    elif trend == "BEARISH" and slope_status == "NEGATIVE":
-        signal = "STRONG SELL 🩸"
-        color = "red"
-    elif trend == "BULLISH" and slope_status == "NEGATIVE":
-        signal = "DIVERGENCE ⚠️ (Price Up, OI Weak)"
-        color = "orange"
-    elif trend == "BEARISH" and slope_status == "POSITIVE":
-        signal = "DIVERGENCE ⚠️ (Price Down, OI Strong)"
-        color = "orange"
-
+        with metrics.stage("fetch"):
+            expiry = get_nearest_expiry()
+            if not expiry: return None
+
+            # Fetch Option Chain (deadline-bound, hedged, last-good fallback), spaced
+            # by the same limiter as the IV surface builder
+            fetched = resilient.get_fetcher("option_chain", fetch_option_chain, limiter=OC_LIMITER).fetch(
+                int(SECURITY_ID), EXCHANGE_SEGMENT, expiry)
+            oc_resp = fetched["data"]
+            if oc_resp is None: return None
+
+        # Stale: re-serve the last analysis instead of folding an old tick into the bars
+        if fetched["stale"] and 'last_data' in st.session_state:
+            return {**st.session_state.last_data, "stale": True, "age": fetched["age"]}
+
+        with metrics.stage("parse"):
+            raw = oc_resp.get('data', {})
+            final_data = raw.get('data', raw) if 'data' in raw else raw
+            oc = final_data.get('oc', {})
+            ltp = final_data.get('last_price', 0)
+            if ltp == 0 or not oc: return None
+            snap = parse_chain(oc, ltp, expiry=expiry)
+
+        if not fetched["stale"]:
+            metrics.mark_snapshot()
+
+    with metrics.stage("analyze"):
+        result = compute_signal(snap, bars)
+    result.update(stale=fetched["stale"], age=fetched["age"])
+    if not fetched["stale"]:
+        sched = st.session_state.scheduler
+        sched.set_expiry(expiry)
+        sched.observe(datetime.now(IST), snap.ltp, result['walls'])
+        # Bus snapshots carry the publisher's timestamp, so every worker writes the same row
+        store.get_store().add(snap, SECURITY_ID, snap.timestamp, result['walls'])
+    st.session_state.last_data = result
+    return result
+
+def compute_signal(snap, bars):
+    timestamp = datetime.now(IST).strftime("%H:%M:%S")
+    bars.update(datetime.now(IST), snap.ltp)
+
+    # Shared features are computed once; every registered strategy reads them
+    features = Features(snap, bars, net_diff_history=st.session_state.log_df['Net Diff'].tolist())
+    params = {"momentum": {"timeframe": TREND_TIMEFRAME}}
+    with metrics.stage("indicators"):
+        results = strategies.evaluate(features, params=params)
+    # Bus snapshots carry the publisher's timestamp; flow is scaled per minute from it
+    events = st.session_state.anomalies.update(snap.timestamp or datetime.now(IST).timestamp(), snap,
+                                               key=(SECURITY_ID, snap.expiry))
+
+    main = results["momentum"]
     return {
         "timestamp": timestamp,
-        "expiry": expiry,
-        "ltp": ltp,
-        "ema": round(calculated_ema, 2),
-        "net_diff": net_diff,
-        "oi_slope": oi_slope,
-        "signal": signal,
-        "color": color,
-        "trend_label": trend
+        "expiry": snap.expiry,
+        "ltp": snap.ltp,
+        "ema": round(main['ema'], 2),
+        "net_diff": main['net_diff'],
+        "oi_slope": main['oi_slope'],
+        "signal": main['signal'],
+        "color": main['color'],
+        "trend_label": main['trend_label'],
+        "walls": features.walls,
+        "net_oi_profile": features.net_oi_profile(),
+        "anomalies": events,
+        "strategies": results
     }
 
 # ---------------------------------------------------------
 # 4. UI LAYOUT
 # ---------------------------------------------------------
 st.title("⚡ Nifty Instant Momentum Scalper")
-st.markdown("*(Trend: EMA-9 on Historical Data | Momentum: Live OI Slope)*")
+st.markdown(f"*(Trend: EMA-9 on {TREND_TIMEFRAME}m Bars | Momentum: Live OI Slope)*")
 
 if st.button("🔄 Refresh"):
     st.rerun()
 
-data = analyze_market()
+profiler.render_sidebar(st)
+
+phase = scheduler.session_phase()
+if phase == scheduler.CLOSED:
+    # No upstream calls outside the session; keep showing the last analysis
+    st.info(scheduler.describe(st.session_state.scheduler.plan()))
+    data = st.session_state.get('last_data')
+else:
+    with profiler.cycle("analyze_market"):
+        data = analyze_market()
 
 if data:
     new_entry = {
@@ -218,6 +272,13 @@ if data:
     if st.session_state.log_df.empty or st.session_state.log_df.iloc[-1]['Timestamp'] != data['timestamp']:
         st.session_state.log_df = pd.concat([st.session_state.log_df, pd.DataFrame([new_entry])], ignore_index=True)
 
+    # ALERTS (queued; sinks deliver on their own threads)
+    event = st.session_state.alert_tracker.update(data['signal'], ltp=data['ltp'], app="momentum")
+    if event:
+        alerts.get_dispatcher(st.secrets.get("alerts", {})).publish(event)
+
+    resilient.stale_banner(st, data)
+
     # METRICS
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Spot Price", f"{data['ltp']}", f"Trend: {data['trend_label']}")
@@ -234,20 +295,53 @@ if data:
     <div style="padding: 15px; border: 2px solid {data['color']}; border-radius: 10px; text-align: center; background: #1e1e1e;">
         <h2 style="color: {data['color']}; margin:0;">{data['signal']}</h2>
         <p style="color: white; margin:0;">EMA: {data['ema']} | Spot: {data['ltp']}</p>
+        {"".join(f'<p style="color: orange; margin:0;">🚨 {anomaly.describe(e)}</p>' for e in data['anomalies'][:3])}
     </div>
     """, unsafe_allow_html=True)
 
     # DATA TABLE
-    tab1, tab2 = st.tabs(["📊 Live Log", "📈 Explanation"])
-    with tab1:
+    # IV SURFACE (solved off the UI thread; we only read the last finished one). Skipped
+    # while a snapshot bus feeds this worker, so extra workers add no upstream calls
+    on_bus = snapbus.get_reader() is not None
+    builder = None if on_bus else iv_surface.get_builder()
+    if builder and phase != scheduler.CLOSED:
+        builder.refresh(datetime.now(IST).strftime("%Y-%m-%d %H:%M"), get_expiries(), fetch_chain)
+
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Live Log", "📈 Explanation", "🌋 IV Surface", "🗄️ History"])
+    with tab1, metrics.stage("render"):
         st.dataframe(st.session_state.log_df.sort_index(ascending=False), use_container_width=True)
+        st.caption("All strategies: " + " | ".join(
+            f"{name}: {r['signal']}" for name, r in data['strategies'].items()))
+        st.caption("Net OI vs ATM window width (flat and distance-weighted)")
+        st.line_chart(data['net_oi_profile'], x="Width", y=["Net OI", "Weighted Net OI"])
+        if st.session_state.anomalies.events:
+            st.caption("Unusual per-strike OI / volume flow (latest first)")
+            st.dataframe(anomaly.frame(st.session_state.anomalies.events, IST), use_container_width=True)
     with tab2:
         st.markdown("""
         **Strategy:**
-        1. **Instant Trend:** We fetch today's price history on startup to calculate EMA-9 immediately.
+        1. **Instant Trend:** We fetch today's price history on startup and fold it, together with live ticks, into aligned bars for EMA-9.
         2. **OI Momentum:** We still need ~3-6 mins of live data to calculate the "Slope" (Rate of Change).
         3. **Signal:** We only trade when **Price Trend** and **OI Momentum** agree.
         """)
-
-time.sleep(180)
+    with tab3:
+        surface = builder.latest() if builder else None
+        if on_bus:
+            st.caption("IV surface is off while this worker reads the shared snapshot bus.")
+        elif surface is None:
+            st.caption("Building IV surface in the background...")
+        else:
+            st.caption(f"Surface from {surface.snapshot_id}" + (" (rebuilding...)" if builder.busy() else ""))
+            st.dataframe(surface.term_structure(), use_container_width=True)
+            smile = surface.smile(data['expiry'])
+            if smile is not None:
+                st.line_chart(smile.dropna(), x="Strike", y="IV %")
+    with tab4:
+        store.render_panel(st, SECURITY_ID, default_strike=round(data['ltp'] / 50) * 50)
+
+metrics.render_panel(st)
+
+plan = st.session_state.scheduler.plan()
+st.caption(scheduler.describe(plan))
+time.sleep(plan['delay'])
 st.rerun()
@@ -1,8 +1,11 @@
 import streamlit as st
 import time
+from datetime import datetime
 from dhan_api import get_option_chain
 from logic import find_signal
 from expiry import get_next_nifty_expiry
+from resilient import get_fetcher, get_limiter, stale_banner
+import scheduler
 
 st.set_page_config(page_title="NIFTY Option Scanner", layout="wide")
 
@@ -14,15 +17,36 @@ expiry = get_next_nifty_expiry()
 st.info(f"Monitoring Expiry: {expiry}")
 
 placeholder = st.empty()
-REFRESH_INTERVAL = 15
+status = st.empty()
+FETCH_DEADLINE = 13
+
+# Raw REST responses have no 'status'; a payload with 'data' counts as good
+fetcher = get_fetcher("optionchain", get_option_chain, deadline=FETCH_DEADLINE,
+                      ok=lambda r: isinstance(r, dict) and "data" in r,
+                      limiter=get_limiter("optionchain", scheduler.UPSTREAM_SPACING))
+sched = scheduler.Scheduler(min_interval=15, base_interval=60)
+sched.set_expiry(datetime.strptime(expiry, "%d-%b-%Y"))
 
 while True:
+    plan = sched.plan()
+    if plan["phase"] == scheduler.CLOSED:
+        # Nothing to poll until the next session
+        status.info(scheduler.describe(plan))
+        time.sleep(plan["delay"])
+        continue
+
     try:
-        data = get_option_chain(ACCESS_TOKEN, expiry)
+        fetched = fetcher.fetch(ACCESS_TOKEN, expiry)
+        data = fetched["data"]
+        if data is None:
+            raise RuntimeError(f"Option chain unavailable (circuit {fetcher.breaker.state})")
         spot = data["data"]["underlyingValue"]
         signal, strike = find_signal(data, spot)
+        if not fetched["stale"]:
+            sched.observe(datetime.now(scheduler.IST), spot)
 
         with placeholder.container():
+            stale_banner(st, fetched)
             st.metric("NIFTY Spot", spot)
             st.metric("Signal", signal)
             if strike:
@@ -45,4 +69,6 @@ while True:
     except Exception as e:
         st.error(str(e))
 
-    time.sleep(REFRESH_INTERVAL)
+    plan = sched.plan()
+    status.caption(scheduler.describe(plan))
+    time.sleep(plan["delay"])
@@ -5,6 +5,25 @@ import time
 import pandas as pd
 import numpy as np
 import pytz
+import altair as alt
+from bars import BarAggregator, TIMEFRAMES
+import metrics
+import profiler
+import alerts
+import strategies
+from chain import parse_chain
+from strategies import Features
+import downsample
+import resilient
+import scheduler
+import snapbus
+import store
+import payoff
+import iv_surface
+from paper import PaperBook, LOT_SIZE
+import export
+import anomaly
+from oi_history import OIHistory
 
 # ---------------------------------------------------------
 # 1. PAGE CONFIG & SESSION
@@ -16,8 +35,24 @@ if 'log_df' not in st.session_state:
     st.session_state.log_df = pd.DataFrame(columns=[
         "Timestamp", "Spot", "EMA_5", "RSI", "Buildup", "Signal"
     ])
-if 'hist_data' not in st.session_state:
-    st.session_state.hist_data = pd.DataFrame()
+if 'bars' not in st.session_state:
+    st.session_state.bars = BarAggregator()
+    st.session_state.hist_loaded = False
+if 'net_diff_history' not in st.session_state:
+    st.session_state.net_diff_history = []
+if 'tick_history' not in st.session_state:
+    st.session_state.tick_history = []     # One row per poll for the charts
+    st.session_state.oi_history = OIHistory()  # Whole-chain OI at every poll
+if 'papers' not in st.session_state:
+    st.session_state.papers = {}           # (SPOT_ID, expiry) -> PaperBook
+if 'alert_tracker' not in st.session_state:
+    st.session_state.alert_tracker = alerts.SignalTracker()
+if 'scheduler' not in st.session_state:
+    st.session_state.scheduler = scheduler.Scheduler()
+if 'last_data' not in st.session_state:
+    st.session_state.last_data = {}        # SPOT_ID -> last analysis, the stale fallback per index
+if 'anomalies' not in st.session_state:
+    st.session_state.anomalies = anomaly.OIFlowDetector()
 
 # ---------------------------------------------------------
 # 2. CONFIGURATION & SIDEBAR
@@ -30,6 +65,8 @@ except:
     st.stop()
 
 dhan = dhanhq(CLIENT_ID, ACCESS_TOKEN)
+metrics.start_server()
+OC_LIMITER = resilient.get_limiter("option_chain", iv_surface.UPSTREAM_SPACING)
 
 # --- SIDEBAR CONTROLS ---
 st.sidebar.title("⚙️ Configuration")
@@ -56,6 +93,25 @@ calculated_date = get_math_expiry(EXPIRY_DAY)
 expiry_date = st.sidebar.date_input("Force Expiry Date:", calculated_date)
 st.sidebar.caption(f"Fetching data for: {expiry_date}")
 
+# 3. Indicator Timeframe (EMA/RSI run on aligned bars, not on raw polls)
+BAR_MINUTES = st.sidebar.selectbox("Indicator Timeframe (min):", TIMEFRAMES, index=0)
+st.session_state.scheduler.bar_minutes = BAR_MINUTES
+st.session_state.scheduler.set_expiry(expiry_date)
+
+# One paper book per index/expiry: positions are only ever marked against their own chain
+paper_book = st.session_state.papers.setdefault((SPOT_ID, str(expiry_date)), PaperBook())
+
+# 4. Paper Trading
+with st.sidebar.expander("📒 Paper Trading", expanded=False):
+    book = paper_book
+    book.lots = st.number_input("Lots", min_value=1, value=book.lots, step=1)
+    book.lot_size = st.number_input("Lot Size", min_value=1, value=int(book.lot_size or LOT_SIZE), step=1)
+    book.slippage = st.number_input("Slippage (pts/side)", min_value=0.0, value=float(book.slippage), step=0.25)
+    book.stop_pct = st.slider("Stop (% of premium)", 5, 90, round(book.stop_pct * 100), key="paper_stop_pct") / 100
+    book.target_pct = st.slider("Target (% of premium)", 5, 300, round(book.target_pct * 100), key="paper_target_pct") / 100
+
+profiler.render_sidebar(st)
+
 # ---------------------------------------------------------
 # 3. DATA FETCHING (NO VALIDATION CHECKS)
 # ---------------------------------------------------------
@@ -65,7 +121,8 @@ def fetch_intraday_data():
         from_date = (now - timedelta(days=5)).strftime("%Y-%m-%d")
         to_date = now.strftime("%Y-%m-%d")
         
-        resp = dhan.intraday_minute_data(
+        resp = metrics.call(
+            "intraday_minute_data", dhan.intraday_minute_data,
             security_id=SPOT_ID,
             exchange_segment="IDX_I",
             instrument_type="INDEX",
@@ -73,21 +130,20 @@ def fetch_intraday_data():
             to_date=to_date
         )
         if resp['status'] != 'success': return None
-        df = pd.DataFrame(resp['data'])
-        return df['close'].astype(float)
+        return pd.DataFrame(resp['data'])
     except: return None
 
-def get_option_chain_forced():
+def get_option_chain_forced(spot_id, date_str):
     """
     Forcefully requests Option Chain for the selected date.
     Tries both segments (IDX_I and NSE_FNO) to handle API quirks.
     """
-    date_str = str(expiry_date)
     
     # Attempt 1: Standard Method (Underlying is IDX_I)
     try:
-        resp = dhan.option_chain(
-            under_security_id=int(SPOT_ID),
+        resp = metrics.call(
+            "option_chain", dhan.option_chain,
+            under_security_id=int(spot_id),
             under_exchange_segment="IDX_I",
             expiry=date_str
         )
@@ -96,8 +152,10 @@ def get_option_chain_forced():
 
     # Attempt 2: Fallback Method (Underlying is NSE_FNO - sometimes required)
     try:
-        resp = dhan.option_chain(
-            under_security_id=int(SPOT_ID),
+        OC_LIMITER.wait()
+        resp = metrics.call(
+            "option_chain", dhan.option_chain,
+            under_security_id=int(spot_id),
             under_exchange_segment="NSE_FNO",
             expiry=date_str
         )
@@ -106,131 +164,176 @@ def get_option_chain_forced():
 
     return None
 
+def read_bus():
+    """(snap, status) from the shared-memory bus when its publisher serves this index/expiry."""
+    bus = snapbus.get_reader()
+    snap = bus.read(security_id=int(SPOT_ID), expiry=str(expiry_date)) if bus else None
+    if snap is None: return None
+    age = time.time() - snap.timestamp
+    return snap, {"stale": age > snapbus.STALE_AFTER, "age": age}
+
 # ---------------------------------------------------------
 # 4. ANALYSIS LOGIC
 # ---------------------------------------------------------
-def analyze_gamma_levels(oc):
-    max_ce_oi = 0
-    max_pe_oi = 0
-    ce_res_strike = 0
-    pe_sup_strike = 0
-    
-    for key, data in oc.items():
-        try:
-            strike = float(key)
-            ce_oi = data.get('ce', {}).get('oi', 0)
-            pe_oi = data.get('pe', {}).get('oi', 0)
-            
-            if ce_oi > max_ce_oi:
-                max_ce_oi = ce_oi
-                ce_res_strike = strike
-            if pe_oi > max_pe_oi:
-                max_pe_oi = pe_oi
-                pe_sup_strike = strike
-        except: continue
-        
-    return ce_res_strike, pe_sup_strike
-
-def calculate_rsi(series, period=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).ewm(alpha=1/period, adjust=False).mean()
-    loss = (-delta.where(delta < 0, 0)).ewm(alpha=1/period, adjust=False).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
-
 def get_market_analysis():
-    # 1. History
-    if st.session_state.hist_data.empty:
-        hist_prices = fetch_intraday_data()
-        if hist_prices is not None:
-            st.session_state.hist_data = hist_prices
-
-    # 2. Option Chain (FORCED)
-    oc_resp = get_option_chain_forced()
+    # 1. History (backfill minute candles into the bar aggregator once)
+    bars = st.session_state.bars
+    if not st.session_state.hist_loaded:
+        hist_df = fetch_intraday_data()
+        if hist_df is not None and not hist_df.empty:
+            bars.backfill(hist_df)
+            st.session_state.hist_loaded = True
+
+    # 2. Shared-memory bus first, when its publisher serves this index/expiry
+    from_bus = read_bus()
+    if from_bus:
+        snap, fetched = from_bus
+        # Stale, or analysed on an earlier run: nothing new to fold into the bars
+        seen = snap.bus_seq == st.session_state.get('bus_seq')
+        if (fetched["stale"] or seen) and SPOT_ID in st.session_state.last_data:
+            return {**st.session_state.last_data[SPOT_ID], "stale": fetched["stale"], "age": fetched["age"]}
+        st.session_state.bus_seq = snap.bus_seq
+        return analyze_snapshot(snap, bars, fetched)
+
+    # 3. Option Chain (FORCED; deadline-bound, hedged, last-good fallback)
+    with metrics.stage("fetch"):
+        fetched = resilient.get_fetcher("option_chain_forced", get_option_chain_forced, limiter=OC_LIMITER).fetch(
+            SPOT_ID, str(expiry_date))
+        oc_resp = fetched["data"]
     
     if not oc_resp:
         st.error(f"❌ Failed to fetch Option Chain for {expiry_date}. Market might be closed or date is invalid.")
         return None
 
+    # Stale: re-serve the last analysis instead of folding an old tick into the bars
+    if fetched["stale"] and SPOT_ID in st.session_state.last_data:
+        return {**st.session_state.last_data[SPOT_ID], "stale": True, "age": fetched["age"]}
+
     try:
-        raw = oc_resp.get('data', {})
-        final_data = raw.get('data', raw) if 'data' in raw else raw
-        oc = final_data.get('oc', {})
-        ltp = final_data.get('last_price', 0)
+        with metrics.stage("parse"):
+            raw = oc_resp.get('data', {})
+            final_data = raw.get('data', raw) if 'data' in raw else raw
+            oc = final_data.get('oc', {})
+            ltp = final_data.get('last_price', 0)
+            snap = parse_chain(oc, ltp, expiry=str(expiry_date))
     except: return None
 
     if ltp == 0: 
         st.warning("⚠️ LTP is 0 (Market Closed?)")
         return None
-
-    # Update History
-    new_price_series = pd.Series([ltp])
-    full_price_series = pd.concat([st.session_state.hist_data, new_price_series], ignore_index=True)
-    if len(full_price_series) > 500: full_price_series = full_price_series.iloc[-500:]
-    st.session_state.hist_data = full_price_series
-
-    # Indicators
-    ema_5 = full_price_series.ewm(span=5, adjust=False).mean().iloc[-1]
-    rsi_series = calculate_rsi(full_price_series)
-    rsi = rsi_series.iloc[-1]
-
-    # Gamma
-    res, sup = analyze_gamma_levels(oc)
-    
-    # Net OI
-    strikes = sorted([(float(k), k) for k in oc.keys()])
-    atm_tuple = min(strikes, key=lambda x: abs(x[0] - ltp))
-    atm_idx = strikes.index(atm_tuple)
-    selected = strikes[max(0, atm_idx - 3) : min(len(strikes), atm_idx + 4)]
-    
-    total_ce_chg = 0
-    total_pe_chg = 0
-    for val, key in selected:
-        d = oc[key]
-        total_ce_chg += (d.get('ce', {}).get('oi', 0) - d.get('ce', {}).get('previous_oi', 0))
-        total_pe_chg += (d.get('pe', {}).get('oi', 0) - d.get('pe', {}).get('previous_oi', 0))
-    
-    net_oi_chg = total_pe_chg - total_ce_chg 
-
-    # Signal Logic
-    buildup = "Neutral"
-    price_chg = full_price_series.iloc[-1] - full_price_series.iloc[-2] if len(full_price_series) > 1 else 0
-    
-    if price_chg > 0 and net_oi_chg > 0: buildup = "Long Buildup (Strong) 🐂"
-    elif price_chg > 0 and net_oi_chg < 0: buildup = "Short Covering (Weak) 👻"
-    elif price_chg < 0 and net_oi_chg < 0: buildup = "Short Buildup (Strong) 🐻"
-    elif price_chg < 0 and net_oi_chg > 0: buildup = "Long Unwinding (Weak) 📉"
-
-    signal = "WAIT"
-    color = "gray"
-    
-    if ltp > ema_5 and rsi > 55 and "Long" in buildup:
-        signal = "SCALP BUY 🚀"
-        color = "green"
-    elif ltp > ema_5 and "Short Covering" in buildup:
-        signal = "BUY (Caution)"
-        color = "lightgreen"
-    elif ltp < ema_5 and rsi < 45 and "Short" in buildup:
-        signal = "SCALP SELL 🩸"
-        color = "red"
-        
-    gamma_msg = "Safe Zone"
-    if abs(ltp - res) < 20: gamma_msg = f"⚠️ Near Call Wall ({res})"
-    if abs(ltp - sup) < 20: gamma_msg = f"⚠️ Near Put Wall ({sup})"
+    if not fetched["stale"]:
+        metrics.mark_snapshot()
+    return analyze_snapshot(snap, bars, fetched)
+
+def analyze_snapshot(snap, bars, fetched):
+    with metrics.stage("analyze"):
+        result = compute_signal(snap, bars)
+    result.update(stale=fetched["stale"], age=fetched["age"])
+    if not fetched["stale"]:
+        st.session_state.scheduler.observe(datetime.now(IST), snap.ltp, (result['res'], result['sup']))
+        # Bus snapshots carry the publisher's timestamp, so every worker writes the same row
+        store.get_store().add(snap, SPOT_ID, snap.timestamp, (result['res'], result['sup']))
+
+    # Paper trading: mark every open position, then act on the new signal
+    ts = datetime.now(IST).timestamp()
+    paper_book.mark_snapshot(ts, snap)
+    paper_book.on_signal(ts, result['signal'], snap)
+    st.session_state.last_data[SPOT_ID] = result
+    return result
+
+def compute_signal(snap, bars):
+    # Update History (fold the tick into the forming bars)
+    bars.update(datetime.now(IST), snap.ltp)
+
+    # Shared features are computed once; every registered strategy reads them
+    features = Features(snap, bars, net_diff_history=st.session_state.net_diff_history)
+    params = {
+        "gamma_scalp": {"timeframe": BAR_MINUTES, "odds": True},    # Monte Carlo wall odds
+        "momentum": {"timeframe": BAR_MINUTES},
+    }
+    with metrics.stage("indicators"):
+        results = strategies.evaluate(features, params=params)
+    st.session_state.net_diff_history.append(features.net_oi(5))
+    del st.session_state.net_diff_history[:-50]
+
+    main = results["gamma_scalp"]
+    # Multi-leg candidates around the walls, priced and ranked in one pass
+    t = iv_surface.year_fraction(snap.expiry)
+    with metrics.stage("structures"):
+        ranked, structures = payoff.rank(payoff.candidates(snap, features.walls), snap, t,
+                                         lot_size=paper_book.lot_size)
+
+    now = datetime.now(IST)
+    ce_total = snap.ce_oi.sum()
+    st.session_state.tick_history.append({
+        "Time": now, "Spot": snap.ltp, "EMA": main['ema'],
+        "PCR": snap.pe_oi.sum() / ce_total if ce_total else np.nan,
+        "Net OI Diff": features.net_oi(3),
+    })
+    st.session_state.oi_history.append_snapshot(now.timestamp(), snap)
+    # Bus snapshots carry the publisher's timestamp; flow is scaled per minute from it
+    events = st.session_state.anomalies.update(snap.timestamp or now.timestamp(), snap, key=(SPOT_ID, snap.expiry))
 
     return {
         "time": datetime.now(IST).strftime("%H:%M:%S"),
-        "ltp": ltp,
-        "ema": round(ema_5, 2),
-        "rsi": round(rsi, 2),
-        "buildup": buildup,
-        "signal": signal,
-        "color": color,
-        "gamma": gamma_msg,
-        "res": res,
-        "sup": sup
+        "ltp": snap.ltp,
+        "ema": round(main['ema'], 2),
+        "rsi": round(main['rsi'], 2),
+        "buildup": main['buildup'],
+        "signal": main['signal'],
+        "color": main['color'],
+        "gamma": main['gamma'],
+        "res": main['res'],
+        "sup": main['sup'],
+        "wall_odds": main['wall_odds'],
+        "net_oi_profile": features.net_oi_profile(),
+        "anomalies": events,
+        "ranked_structures": ranked,
+        "structures": structures,
+        "t": t,
+        "strategies": results
     }
 
+def render_charts(strike_window=10):
+    """Spot/EMA, PCR, net OI and OI-by-strike, each capped at MAX_POINTS."""
+    hist = pd.DataFrame(st.session_state.tick_history)
+    if len(hist) < 2:
+        st.caption("Charts appear after a couple of refreshes.")
+        return
+
+    hist["Time"] = pd.to_datetime(hist["Time"])
+    st.line_chart(downsample.downsample_frame(hist, "Time", ["Spot", "EMA"]), x="Time")
+    c1, c2 = st.columns(2)
+    c1.line_chart(downsample.downsample_frame(hist, "Time", ["PCR"]), x="Time")
+    c2.line_chart(downsample.downsample_frame(hist, "Time", ["Net OI Diff"], method="minmax"), x="Time")
+
+    # Heatmap of intra-session flow: PE-CE OI change since the previous poll,
+    # over the latest ATM window (strikes missing in older polls stay 0)
+    oi_hist = st.session_state.oi_history
+    latest = oi_hist.snapshot(len(oi_hist) - 1)["strikes"]
+    atm = int(np.abs(latest - st.session_state.tick_history[-1]["Spot"]).argmin())
+    grid = latest[max(0, atm - strike_window): atm + strike_window + 1]
+    net = oi_hist.matrix(grid, "pe") - oi_hist.matrix(grid, "ce")
+    flow = np.diff(net, axis=0, prepend=net[:1])
+    times = [datetime.fromtimestamp(t, IST).strftime("%H:%M:%S") for t in oi_hist.times]
+
+    heat = downsample.heatmap_frame(times, grid, flow)
+    st.altair_chart(alt.Chart(heat).mark_rect().encode(
+        x=alt.X("Time:O", axis=alt.Axis(labelOverlap=True)),
+        y=alt.Y("Strike:O", sort="descending"),
+        color=alt.Color("Value:Q", title="PE-CE ΔOI / poll", scale=alt.Scale(scheme="redyellowgreen", domainMid=0)),
+    ), use_container_width=True)
+
+    # Point query: OI change at one strike between two polls
+    q1, q2, q3 = st.columns(3)
+    strike = q1.selectbox("Strike", grid, index=len(grid) // 2)
+    i1, i2 = q2.select_slider("Between", options=range(len(times)), value=(0, len(times) - 1),
+                              format_func=lambda i: times[i])
+    ce_chg = oi_hist.oi_at(strike, i2, "ce") - oi_hist.oi_at(strike, i1, "ce")
+    pe_chg = oi_hist.oi_at(strike, i2, "pe") - oi_hist.oi_at(strike, i1, "pe")
+    q3.metric(f"{strike:.0f} ΔOI (CE / PE)", f"{ce_chg:,} / {pe_chg:,}")
+    st.caption(f"OI history: {len(oi_hist)} polls, {oi_hist.nbytes() / 1e6:.2f} MB")
+
 # ---------------------------------------------------------
 # 5. DASHBOARD
 # ---------------------------------------------------------
@@ -239,7 +342,13 @@ st.title("💪 Gamma Hunter (Force Mode)")
 if st.button("🔄 Refresh Now"):
     st.rerun()
 
-data = get_market_analysis()
+if scheduler.session_phase() == scheduler.CLOSED:
+    # No upstream calls outside the session; keep showing the last analysis
+    st.info(scheduler.describe(st.session_state.scheduler.plan()))
+    data = st.session_state.last_data.get(SPOT_ID)
+else:
+    with profiler.cycle("get_market_analysis"):
+        data = get_market_analysis()
 
 if data:
     new_row = {
@@ -249,29 +358,105 @@ if data:
     if st.session_state.log_df.empty or st.session_state.log_df.iloc[-1]['Timestamp'] != data['time']:
         st.session_state.log_df = pd.concat([st.session_state.log_df, pd.DataFrame([new_row])], ignore_index=True)
 
+    # Alerts (queued; sinks deliver on their own threads)
+    event = st.session_state.alert_tracker.update(data['signal'], ltp=data['ltp'], app="gamma")
+    if event:
+        alerts.get_dispatcher(st.secrets.get("alerts", {})).publish(event)
+
+    resilient.stale_banner(st, data)
+
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Spot Price", data['ltp'], f"{data['ltp']-data['ema']:.1f} vs EMA")
     c2.metric("RSI", data['rsi'])
-    c3.metric("Call Wall", data['res'])
-    c4.metric("Put Wall", data['sup'])
+    odds = data['wall_odds']
+    touch = dict(zip(odds['levels']['Level'], odds['levels']['P(touch)'])) if odds else {}
+    c3.metric("Call Wall", data['res'], f"{touch['Call Wall']:.0%} touch" if 'Call Wall' in touch else None,
+              delta_color="off")
+    c4.metric("Put Wall", data['sup'], f"{touch['Put Wall']:.0%} touch" if 'Put Wall' in touch else None,
+              delta_color="off")
 
     st.markdown(f"""
     <div style="padding: 20px; background: #262730; border-radius: 10px; border: 2px solid {data['color']}; text-align: center;">
         <h1 style="color: {data['color']}; margin:0;">{data['signal']}</h1>
         <h3 style="color: white; margin:5px;">{data['buildup']}</h3>
         <p style="color: yellow; font-weight: bold;">{data['gamma']}</p>
+        {"".join(f'<p style="color: orange; margin:0;">🚨 {anomaly.describe(e)}</p>' for e in data['anomalies'][:3])}
     </div>
     """, unsafe_allow_html=True)
 
-    with st.expander("📜 Logs", expanded=True):
+    with st.expander("🧩 All Strategies", expanded=False):
+        st.dataframe([
+            {"Strategy": name, "Signal": r['signal'], "Strike": r.get('strike')}
+            for name, r in data['strategies'].items()
+        ], use_container_width=True)
+
+    if odds:
+        with st.expander("🎲 Wall Odds to Expiry", expanded=False):
+            st.caption(f"GBM at ATM IV, {odds['paths']:,} paths in {odds['elapsed']:.2f}s")
+            st.dataframe(odds['levels'].style.format({"P(touch)": "{:.1%}", "P(close beyond)": "{:.1%}"}),
+                         use_container_width=True)
+            st.dataframe(odds['range'], use_container_width=True)
+
+    with st.expander("🚨 OI Flow Anomalies", expanded=bool(data['anomalies'])):
+        events = st.session_state.anomalies.events
+        if not events:
+            st.caption("No unusual per-strike OI or volume flow yet today.")
+        else:
+            st.caption("Bursts: one poll's flow beyond z 5. Build-ups / unwinds: sustained drift (CUSUM).")
+            st.dataframe(anomaly.frame(events, IST), use_container_width=True)
+
+    with st.expander("📐 Net OI Profile", expanded=False):
+        st.caption("PE-CE OI change over ATM±width, flat and weighted toward ATM")
+        st.line_chart(data['net_oi_profile'], x="Width", y=["Net OI", "Weighted Net OI"])
+
+    with st.expander("🧮 Strategy Builder", expanded=False):
+        ranked = data['ranked_structures']
+        if ranked.empty:
+            st.caption("No fully listed structures around the walls.")
+        else:
+            st.caption("Ranked by E[P&L] / CVaR 5% at ATM IV; unlimited-risk structures last. P&L per lot set.")
+            st.dataframe(ranked, use_container_width=True)
+            pick = st.selectbox("Payoff", range(len(ranked)),
+                                format_func=lambda i: f"{ranked['Structure'][i]}: {ranked['Legs'][i]}")
+            curve = payoff.payoff_frame(data['structures'], pick, data['ltp'], data['t'],
+                                        lot_size=paper_book.lot_size)
+            st.line_chart(curve, x="Spot", y=["Expiry", "T+0"])
+
+    with st.expander("📒 Paper Trades", expanded=False):
+        book = paper_book
+        st.caption(f"{index_choice} {expiry_date} book")
+        p1, p2, p3 = st.columns(3)
+        p1.metric("Realized P&L", f"{book.realized:,.0f}")
+        p2.metric("Unrealized P&L", f"{book.unrealized():,.0f}")
+        p3.metric("Open Positions", book.open_count)
+        if book.equity:
+            st.line_chart(downsample.downsample_frame(book.equity_curve(), "Time", ["Equity"]), x="Time")
+            st.dataframe(book.positions().sort_index(ascending=False), use_container_width=True)
+
+    with st.expander("📈 Charts", expanded=False):
+        render_charts()
+
+    with st.expander("📜 Logs", expanded=True), metrics.stage("render"):
         st.dataframe(st.session_state.log_df.sort_index(ascending=False), use_container_width=True)
     
-    st.download_button("📥 Download Log", st.session_state.log_df.to_csv(index=False).encode('utf-8'), "gamma_log.csv")
+    with st.expander("🗄️ History", expanded=False):
+        store.render_panel(st, SPOT_ID, default_strike=round(data['ltp'] / 50) * 50)
+
+    # Exports are only built on request, on a background thread
+    with st.expander("📥 Export", expanded=False):
+        export.render_panel(st, {
+            "Signal Log": lambda: export.frame_chunks(st.session_state.log_df.copy()),
+            "Strike Snapshots": lambda: st.session_state.oi_history.iter_frames(),
+        })
+
+metrics.render_panel(st)
 
 st.divider()
-st.caption("Auto-refreshing in 180s...")
+plan = st.session_state.scheduler.plan()
+st.caption(scheduler.describe(plan))
 progress_bar = st.progress(0)
-for i in range(180):
-    time.sleep(1)
-    progress_bar.progress((i + 1) / 180)
+steps = max(int(plan['delay']), 1)
+for i in range(steps):
+    time.sleep(plan['delay'] / steps)
+    progress_bar.progress((i + 1) / steps)
 st.rerun()
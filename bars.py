@@ -0,0 +1,113 @@
+from collections import deque
+from datetime import datetime, time as dtime, timedelta
+
+import pandas as pd
+import pytz
+
+IST = pytz.timezone('Asia/Kolkata')
+
+TIMEFRAMES = (1, 3, 5, 15)      # Minutes
+SESSION_OPEN = dtime(9, 15)     # NSE cash/F&O open
+
+BAR_COLUMNS = ["start", "open", "high", "low", "close", "volume"]
+
+
+def to_ist(ts):
+    """Normalises epoch seconds / naive / aware datetimes to IST."""
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts, IST)
+    if isinstance(ts, str):
+        ts = pd.Timestamp(ts).to_pydatetime()
+    if ts.tzinfo is None:
+        return IST.localize(ts)
+    return ts.astimezone(IST)
+
+
+def bar_start(ts, minutes):
+    """
+    Start of the `minutes` bar containing `ts`, aligned to the 09:15 open
+    (so 3m bars are 09:15, 09:18, ... and 15m bars are 09:15, 09:30, ...).
+    """
+    ts = to_ist(ts)
+    session_open = ts.replace(hour=SESSION_OPEN.hour, minute=SESSION_OPEN.minute, second=0, microsecond=0)
+    offset = int((ts - session_open).total_seconds() // 60)
+    return session_open + timedelta(minutes=(offset // minutes) * minutes)
+
+
+class BarAggregator:
+    """
+    Folds ticks (or finer bars) into aligned OHLCV bars for several
+    timeframes at once. Each update is O(1) per timeframe: only the forming
+    bar is touched, completed bars are appended to a bounded deque.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES, maxlen=500):
+        self.timeframes = tuple(timeframes)
+        self._done = {tf: deque(maxlen=maxlen) for tf in self.timeframes}
+        self._open = {tf: None for tf in self.timeframes}
+
+    def update(self, ts, price, volume=0, high=None, low=None, close=None):
+        """
+        Adds one tick. When `high`/`low`/`close` are given the update is a
+        whole sub-bar (e.g. a backfilled 1m candle) with `price` as its open.
+        """
+        high = price if high is None else high
+        low = price if low is None else low
+        close = price if close is None else close
+
+        for tf in self.timeframes:
+            start = bar_start(ts, tf)
+            bar = self._open[tf]
+
+            if bar is not None and start < bar[0]:
+                continue  # Late tick for an already closed bar
+
+            if bar is None or start > bar[0]:
+                if bar is not None:
+                    self._done[tf].append(tuple(bar))
+                self._open[tf] = [start, price, high, low, close, volume]
+                continue
+
+            if high > bar[2]: bar[2] = high
+            if low < bar[3]: bar[3] = low
+            bar[4] = close
+            bar[5] += volume
+
+    def backfill(self, df):
+        """
+        Seeds the aggregator from Dhan `intraday_minute_data` output so live
+        ticks continue the same bars. Accepts 'timestamp' (epoch) or
+        'start_Time' columns.
+        """
+        if df is None or len(df) == 0:
+            return
+        ts_col = 'timestamp' if 'timestamp' in df else 'start_Time'
+        if ts_col not in df:
+            return
+
+        vol = df['volume'] if 'volume' in df else pd.Series(0, index=df.index)
+        rows = zip(df[ts_col], df['open'], df['high'], df['low'], df['close'], vol)
+        for ts, o, h, l, c, v in rows:
+            self.update(ts, float(o), float(v), high=float(h), low=float(l), close=float(c))
+
+    def last_start(self, minutes):
+        bar = self._open[minutes]
+        return bar[0] if bar else None
+
+    def bars(self, minutes, include_forming=True):
+        rows = list(self._done[minutes])
+        if include_forming and self._open[minutes] is not None:
+            rows.append(tuple(self._open[minutes]))
+        return pd.DataFrame(rows, columns=BAR_COLUMNS)
+
+    def closes(self, minutes, include_forming=True):
+        """Close series for indicators; the forming bar acts as the live tick."""
+        rows = self._done[minutes]
+        values = [bar[4] for bar in rows]
+        if include_forming and self._open[minutes] is not None:
+            values.append(self._open[minutes][4])
+        return pd.Series(values, dtype=float)
+
+    def __len__(self):
+        tf = self.timeframes[0]
+        return len(self._done[tf]) + (self._open[tf] is not None)
@@ -0,0 +1,125 @@
+"""
+Columnar view of a Dhan v2 option chain.
+
+`oc` arrives as {"24500.000000": {"ce": {...}, "pe": {...}}, ...}. Parsing it
+once into sorted NumPy arrays lets every consumer (signals, walls, windows,
+greeks) work on vectors instead of re-walking the nested dicts.
+"""
+import numpy as np
+
+# Per-leg fields pulled out of each strike: column suffix -> (key, greek?)
+LEG_FIELDS = {
+    "oi": ("oi", False),
+    "prev_oi": ("previous_oi", False),
+    "volume": ("volume", False),
+    "ltp": ("last_price", False),
+    "iv": ("implied_volatility", False),
+    "delta": ("delta", True),
+    "gamma": ("gamma", True),
+    "theta": ("theta", True),
+    "vega": ("vega", True),
+}
+
+
+class ChainSnapshot:
+    """
+    Sorted strike grid plus one float64 array per leg field, e.g.
+    `snap.ce_oi`, `snap.pe_delta`, `snap.ce_oi_chg`.
+    """
+
+    def __init__(self, strikes, keys, columns, ltp, expiry=None, timestamp=None):
+        self.strikes = strikes
+        self.keys = keys
+        self.ltp = float(ltp)
+        self.expiry = expiry
+        self.timestamp = timestamp
+        self.columns = columns
+        for name, values in columns.items():
+            setattr(self, name, values)
+        self.ce_oi_chg = self.ce_oi - self.ce_prev_oi
+        self.pe_oi_chg = self.pe_oi - self.pe_prev_oi
+
+    def __len__(self):
+        return len(self.strikes)
+
+    @property
+    def atm_idx(self):
+        if not len(self.strikes): return None
+        return int(np.abs(self.strikes - self.ltp).argmin())
+
+    def window(self, width, center=None):
+        """Slice of strikes ATM-width .. ATM+width (clipped to the chain)."""
+        center = self.atm_idx if center is None else center
+        return slice(max(0, center - width), min(len(self.strikes), center + width + 1))
+
+    @property
+    def _net_prefix(self):
+        """
+        Prefix sums of PE-CE OI change (x) and of i*x, each with a leading 0,
+        built once per snapshot so every window below is O(1).
+        """
+        if "_prefix" not in self.__dict__:
+            x = self.pe_oi_chg - self.ce_oi_chg
+            self._prefix = (np.concatenate(([0.0], np.cumsum(x))),
+                            np.concatenate(([0.0], np.cumsum(x * np.arange(len(x))))))
+        return self._prefix
+
+    def _bounds(self, widths, center):
+        center = self.atm_idx if center is None else center
+        widths = np.asarray(widths)
+        lo = np.clip(center - widths, 0, len(self.strikes))
+        hi = np.clip(center + widths + 1, 0, len(self.strikes))
+        return center, lo, hi
+
+    def net_oi(self, widths, center=None):
+        """PE minus CE OI change over ATM±width; `widths` may be an array of widths."""
+        if not len(self.strikes): return np.zeros(np.shape(widths))
+        cs, _ = self._net_prefix
+        _, lo, hi = self._bounds(widths, center)
+        return cs[hi] - cs[lo]
+
+    def weighted_net_oi(self, widths, center=None):
+        """
+        Net OI over ATM±width with triangular weights 1 - |i - ATM| / (width + 1),
+        so near-ATM strikes count most. Also O(1) per width, via sum(x) and sum(i*x).
+        """
+        if not len(self.strikes): return np.zeros(np.shape(widths))
+        cs, ics = self._net_prefix
+        c, lo, hi = self._bounds(widths, center)
+        scale = np.asarray(widths) + 1.0
+        mid = min(c + 1, len(self.strikes))
+        # Left of (and at) ATM weight is 1 - (c - i)/scale; right of it 1 - (i - c)/scale
+        left = (cs[mid] - cs[lo]) * (1 - c / scale) + (ics[mid] - ics[lo]) / scale
+        right = (cs[hi] - cs[mid]) * (1 + c / scale) - (ics[hi] - ics[mid]) / scale
+        return left + right
+
+
+def parse_chain(oc, ltp, expiry=None, timestamp=None):
+    strikes = []
+    keys = []
+    for key in oc.keys():
+        try:
+            strikes.append(float(key))
+            keys.append(key)
+        except (TypeError, ValueError):
+            continue
+
+    order = np.argsort(strikes)
+    keys = [keys[i] for i in order]
+    n = len(keys)
+
+    columns = {}
+    for side in ("ce", "pe"):
+        for suffix in LEG_FIELDS:
+            columns[f"{side}_{suffix}"] = np.zeros(n)
+
+    for i, key in enumerate(keys):
+        d = oc[key]
+        for side in ("ce", "pe"):
+            leg = d.get(side) or {}
+            greeks = leg.get('greeks') or {}
+            for suffix, (field, is_greek) in LEG_FIELDS.items():
+                value = (greeks if is_greek else leg).get(field, 0)
+                columns[f"{side}_{suffix}"][i] = value or 0
+
+    return ChainSnapshot(np.asarray(strikes, dtype=float)[order], keys, columns, ltp, expiry, timestamp)
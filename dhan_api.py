@@ -1,6 +1,7 @@
 import requests
 
 BASE_URL = "https://api.dhan.co/v2"
+TIMEOUT = (3.05, 10)     # Connect, read; a hung request must not hold a fetch thread
 
 def get_option_chain(access_token, expiry):
     url = f"{BASE_URL}/optionchain"
@@ -16,5 +17,5 @@ def get_option_chain(access_token, expiry):
         "expiry": expiry
     }
 
-    r = requests.post(url, json=payload, headers=headers)
+    r = requests.post(url, json=payload, headers=headers, timeout=TIMEOUT)
     return r.json()
@@ -0,0 +1,111 @@
+"""
+Server-side downsampling for the intraday charts.
+
+Charts are fed from the stored tick history, which grows all day; these
+helpers cap each payload at a fixed number of points regardless of length.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 400
+
+
+def lttb(x, y, n):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first/last point and, per
+    bucket, the point forming the largest triangle with its neighbours.
+    Returns the selected indices.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0] = 0
+    keep[-1] = size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n):
+    """
+    Min/max bucketing: per bucket keep the min and max sample (in time
+    order), so spikes survive. Returns sorted indices, at most `n`.
+    """
+    y = np.asarray(y, dtype=float)
+    size = len(y)
+    buckets = (n - 2) // 2   # Leaves room for the first and last sample
+    if n >= size or buckets < 1:
+        return np.arange(size)
+
+    edges = np.linspace(0, size, buckets + 1).astype(int)
+    starts = edges[:-1]
+    # Sort within each bucket to find its extreme positions without a Python loop
+    filled = np.where(np.isnan(y), np.nanmean(y), y)
+    bucket_id = np.repeat(np.arange(buckets), np.diff(edges))
+    order_max = np.lexsort((-filled, bucket_id))
+    order_min = np.lexsort((filled, bucket_id))
+    first = np.searchsorted(bucket_id[order_max], np.arange(buckets))
+    idx = np.concatenate([order_max[first], order_min[first], starts[:1], [size - 1]])
+    return np.unique(idx)
+
+
+def downsample_frame(df, x, columns, n=MAX_POINTS, method="lttb"):
+    """
+    Downsamples `columns` of `df` against `x`. With LTTB each column picks
+    its own points and the union is returned, capped near `n` per column.
+    """
+    if len(df) <= n:
+        return df[[x] + list(columns)]
+    col = df[x]
+    if pd.api.types.is_datetime64_any_dtype(col):
+        xs = (col - col.iloc[0]).dt.total_seconds().to_numpy()
+    else:
+        xs = col.to_numpy(dtype=float)
+    keep = set()
+    per_col = max(n // len(columns), 3)
+    for name in columns:
+        if method == "minmax":
+            keep.update(minmax(df[name].to_numpy(), per_col).tolist())
+        else:
+            keep.update(lttb(xs, df[name].to_numpy(), per_col).tolist())
+    return df.iloc[sorted(keep)][[x] + list(columns)]
+
+
+def bucket_matrix(times, matrix, n_times):
+    """
+    Collapses the time axis of a (time x strike) matrix to at most `n_times`
+    rows, keeping per bucket the value with the largest magnitude so bursts
+    at a strike stay visible. Returns (bucket times, matrix).
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    rows = len(matrix)
+    if rows <= n_times:
+        return list(times), matrix
+    edges = np.linspace(0, rows, n_times + 1).astype(int)
+    maxs = np.maximum.reduceat(matrix, edges[:-1], axis=0)
+    mins = np.minimum.reduceat(matrix, edges[:-1], axis=0)
+    out = np.where(np.abs(maxs) >= np.abs(mins), maxs, mins)
+    return [times[i] for i in edges[:-1]], out
+
+
+def heatmap_frame(times, strikes, matrix, max_cells=MAX_POINTS * 10):
+    """Long-form (Time, Strike, Value) frame capped at `max_cells` cells."""
+    n_times = max(max_cells // max(len(strikes), 1), 1)
+    bt, bm = bucket_matrix(times, matrix, n_times)
+    return pd.DataFrame({
+        "Time": np.repeat(bt, len(strikes)),
+        "Strike": np.tile(strikes, len(bt)),
+        "Value": bm.ravel(),
+    })
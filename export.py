@@ -0,0 +1,149 @@
+"""
+On-demand, chunked exports of session logs and snapshot history.
+
+Nothing is serialised until someone asks. An export then runs on a
+background thread, streaming frame chunks to a file under NOM_EXPORT_DIR as
+CSV, Parquet or Arrow IPC (the latter two need pyarrow). The download
+button reads the file only when clicked, and the file is removed once
+served; exports nobody downloaded are pruned after EXPORT_TTL.
+"""
+import os
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_DIR = os.environ.get("NOM_EXPORT_DIR", "exports")
+CHUNK_ROWS = 50_000
+EXPORT_TTL = 3600           # Seconds an undownloaded export is kept
+
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def available_formats():
+    return [f for f in FORMATS if f == "CSV" or pa is not None]
+
+
+def frame_chunks(df, rows=CHUNK_ROWS):
+    """Splits one DataFrame into row chunks (views, no copies)."""
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def write_chunks(chunks, path, fmt):
+    """Streams DataFrame chunks to `path`; returns rows written."""
+    written = 0
+    writer = None
+    try:
+        if fmt == "CSV":
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                for i, chunk in enumerate(chunks):
+                    chunk.to_csv(f, index=False, header=(i == 0))
+                    written += len(chunk)
+            return written
+
+        if pa is None:
+            raise RuntimeError(f"{fmt} export needs pyarrow")
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if fmt == "Parquet":
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                else:
+                    writer = pa.ipc.new_file(path, table.schema)
+            if fmt == "Parquet":
+                writer.write_table(table)
+            else:
+                writer.write(table)
+            written += len(chunk)
+        return written
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def prune(directory=EXPORT_DIR, max_age=EXPORT_TTL):
+    """Deletes export files older than `max_age` seconds; returns how many."""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class ExportJob:
+    """One export running on a daemon thread."""
+
+    def __init__(self, name, chunks, fmt):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        prune()
+        ext, self.mime = FORMATS[fmt]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.name = name
+        self.path = os.path.join(EXPORT_DIR, f"{name}-{stamp}{ext}")
+        self.rows = 0
+        self.error = None
+        self.done = False
+        self._thread = threading.Thread(target=self._run, args=(chunks, fmt), daemon=True)
+        self._thread.start()
+
+    def _run(self, chunks, fmt):
+        try:
+            self.rows = write_chunks(chunks, self.path, fmt)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.done = True
+
+    def payload(self):
+        """File contents for the download; the file is deleted once read."""
+        with open(self.path, "rb") as f:
+            data = f.read()
+        os.remove(self.path)
+        return data
+
+
+def render_panel(st, sources, key="export"):
+    """
+    Export controls. `sources` maps a name to a zero-arg callable returning a
+    chunk iterator; it is only called when the user starts an export.
+    """
+    job = st.session_state.get(key)
+    c1, c2, c3 = st.columns([2, 2, 1])
+    source = c1.selectbox("Data", list(sources), key=f"{key}_source")
+    fmt = c2.selectbox("Format", available_formats(), key=f"{key}_fmt")
+    if c3.button("Prepare", key=f"{key}_go", disabled=job is not None and not job.done):
+        st.session_state[key] = job = ExportJob(source.lower().replace(" ", "_"), sources[source](), fmt)
+
+    if job is None:
+        return
+    if not job.done:
+        st.caption(f"Preparing {os.path.basename(job.path)}... (refresh to check)")
+    elif job.error:
+        st.error(f"Export failed: {job.error}")
+    elif not os.path.exists(job.path):
+        st.session_state.pop(key, None)         # Pruned or already served
+    else:
+        def clear():
+            st.session_state.pop(key, None)
+        # Passing the callable defers reading the file until the click
+        st.download_button(f"📥 Download {os.path.basename(job.path)} ({job.rows:,} rows)", job.payload,
+                           os.path.basename(job.path), job.mime, key=f"{key}_dl", on_click=clear)
@@ -0,0 +1,282 @@
+"""
+Multi-expiry implied-volatility surface.
+
+Every listed expiry is fetched, IV is solved for every strike in one
+vectorised Newton/bisection pass, and a quadratic smile in log-moneyness is
+fitted per expiry. The solve/fit runs in a process pool behind a background
+thread, so the dashboard only ever reads the last finished `Surface`.
+"""
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import resilient
+from chain import parse_chain
+
+IST = pytz.timezone('Asia/Kolkata')
+
+RISK_FREE = 0.065           # Annualised, continuous
+EXPIRY_CUTOFF = (15, 30)    # Options expire at 15:30 IST
+MIN_T = 1 / (365 * 24 * 60)  # One minute, avoids divide-by-zero on expiry day
+UPSTREAM_SPACING = 3.0      # Dhan allows one option-chain call per 3 seconds
+
+
+# ---------------------------------------------------------
+# BLACK-SCHOLES (vectorised)
+# ---------------------------------------------------------
+try:
+    from scipy.special import erf as _erf
+except ImportError:
+    _erf = np.vectorize(math.erf, otypes=[float])
+
+
+def _norm_cdf(x):
+    return 0.5 * (1.0 + _erf(x / math.sqrt(2.0)))
+
+
+def _norm_pdf(x):
+    return np.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def bs_price(spot, strike, t, vol, is_call, r=RISK_FREE):
+    spot, strike, t, vol = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (spot, strike, t, vol)))
+    sqrt_t = np.sqrt(np.maximum(t, MIN_T))
+    vol = np.maximum(vol, 1e-6)
+    d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    disc = np.exp(-r * t)
+    call = spot * _norm_cdf(d1) - strike * disc * _norm_cdf(d2)
+    put = call - spot + strike * disc
+    return np.where(is_call, call, put)
+
+
+def bs_vega(spot, strike, t, vol, r=RISK_FREE):
+    sqrt_t = np.sqrt(np.maximum(t, MIN_T))
+    vol = np.maximum(vol, 1e-6)
+    d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    return spot * _norm_pdf(d1) * sqrt_t
+
+
+def bs_delta(spot, strike, t, vol, is_call, r=RISK_FREE):
+    sqrt_t = np.sqrt(np.maximum(t, MIN_T))
+    vol = np.maximum(vol, 1e-6)
+    d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    nd1 = _norm_cdf(d1)
+    return np.where(is_call, nd1, nd1 - 1.0)
+
+
+def bs_gamma(spot, strike, t, vol, r=RISK_FREE):
+    sqrt_t = np.sqrt(np.maximum(t, MIN_T))
+    vol = np.maximum(vol, 1e-6)
+    d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    return _norm_pdf(d1) / (spot * vol * sqrt_t)
+
+
+def bs_theta(spot, strike, t, vol, is_call, r=RISK_FREE):
+    """Per calendar day."""
+    sqrt_t = np.sqrt(np.maximum(t, MIN_T))
+    vol = np.maximum(vol, 1e-6)
+    d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    disc = strike * np.exp(-r * t)
+    decay = -spot * _norm_pdf(d1) * vol / (2 * sqrt_t)
+    call = decay - r * disc * _norm_cdf(d2)
+    put = decay + r * disc * _norm_cdf(-d2)
+    return np.where(is_call, call, put) / 365
+
+
+def implied_vol(price, spot, strike, t, is_call, r=RISK_FREE, iters=40, tol=1e-6):
+    """
+    Solves IV for whole arrays at once. Newton steps are used where vega is
+    healthy and the step stays inside the bisection bracket; otherwise the
+    bracket is halved. Prices outside no-arbitrage bounds come back NaN.
+    """
+    price, strike, t, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(t, dtype=float), np.asarray(is_call, dtype=bool))
+    disc = np.exp(-r * t)
+    intrinsic = np.where(is_call, np.maximum(spot - strike * disc, 0), np.maximum(strike * disc - spot, 0))
+    upper = np.where(is_call, spot, strike * disc)
+    valid = (price > intrinsic) & (price < upper) & (strike > 0)
+
+    lo = np.full(price.shape, 1e-4)
+    hi = np.full(price.shape, 5.0)
+    vol = np.full(price.shape, 0.2)
+
+    for _ in range(iters):
+        diff = bs_price(spot, strike, t, vol, is_call, r) - price
+        lo = np.where(diff < 0, vol, lo)
+        hi = np.where(diff > 0, vol, hi)
+        vega = bs_vega(spot, strike, t, vol, r)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = vol - diff / vega
+        ok = (vega > 1e-8) & (newton > lo) & (newton < hi)
+        vol = np.where(ok, newton, 0.5 * (lo + hi))
+        if np.all(np.abs(diff[valid]) < tol):
+            break
+
+    return np.where(valid, vol, np.nan)
+
+
+def year_fraction(expiry, now=None):
+    """Years from `now` to 15:30 IST on `expiry` (YYYY-MM-DD)."""
+    now = now or datetime.now(IST)
+    exp = IST.localize(datetime.strptime(str(expiry), "%Y-%m-%d").replace(
+        hour=EXPIRY_CUTOFF[0], minute=EXPIRY_CUTOFF[1]))
+    return max((exp - now).total_seconds() / (365 * 24 * 3600), MIN_T)
+
+
+# ---------------------------------------------------------
+# PER-EXPIRY SOLVE (runs in worker processes)
+# ---------------------------------------------------------
+def solve_expiry(expiry, spot, t, strikes, ce_ltp, pe_ltp, r=RISK_FREE):
+    """
+    Solves OTM IVs for one expiry and fits iv = a + b*k + c*k^2 with
+    k = ln(K/F). Arguments are plain arrays so the call pickles cheaply.
+    """
+    forward = spot * math.exp(r * t)
+    use_call = strikes >= forward
+    price = np.where(use_call, ce_ltp, pe_ltp)
+    iv = implied_vol(price, spot, strikes, t, use_call, r)
+    k = np.log(strikes / forward)
+
+    ok = np.isfinite(iv) & (price > 0)
+    coeffs = np.full(3, np.nan)
+    if ok.sum() >= 3:
+        # Weight near-the-money strikes more; wings are noisy
+        w = np.exp(-(k[ok] / 0.05) ** 2) + 0.05
+        coeffs = np.polyfit(k[ok], iv[ok], 2, w=w)
+
+    def smile(x):
+        return np.polyval(coeffs, x)
+
+    atm_iv = float(smile(0.0)) if np.isfinite(coeffs).all() else float("nan")
+
+    # 25-delta skew: IV(25d put) - IV(25d call) read off the fitted smile
+    skew = float("nan")
+    if np.isfinite(atm_iv):
+        grid = np.linspace(-0.2, 0.2, 401)
+        grid_iv = np.clip(smile(grid), 1e-3, None)
+        grid_k = forward * np.exp(grid)
+        call_d = bs_delta(spot, grid_k, t, grid_iv, True, r)
+        put_d = bs_delta(spot, grid_k, t, grid_iv, False, r)
+        skew = float(grid_iv[np.abs(put_d + 0.25).argmin()] - grid_iv[np.abs(call_d - 0.25).argmin()])
+
+    return {
+        "expiry": expiry, "t": t, "forward": forward, "strikes": strikes,
+        "iv": iv, "coeffs": coeffs, "atm_iv": atm_iv, "skew_25d": skew,
+    }
+
+
+class Surface:
+    """Finished surface for one snapshot; read-only from the UI."""
+
+    def __init__(self, snapshot_id, spot, slices):
+        self.snapshot_id = snapshot_id
+        self.spot = spot
+        self.slices = sorted(slices, key=lambda s: s["t"])
+        self.built_at = time.time()
+
+    def term_structure(self):
+        return pd.DataFrame([{
+            "Expiry": s["expiry"],
+            "Days": round(s["t"] * 365, 2),
+            "ATM IV %": round(100 * s["atm_iv"], 2),
+            "25Δ Skew %": round(100 * s["skew_25d"], 2),
+        } for s in self.slices])
+
+    def smile(self, expiry):
+        for s in self.slices:
+            if s["expiry"] == expiry:
+                return pd.DataFrame({"Strike": s["strikes"], "IV %": 100 * s["iv"]})
+        return None
+
+
+# ---------------------------------------------------------
+# BACKGROUND BUILDER
+# ---------------------------------------------------------
+class SurfaceBuilder:
+    """
+    `refresh()` returns immediately. A background thread fetches each expiry
+    and fans the solves out to a process pool; `latest()` always returns the
+    most recent finished surface. Fetches take slots from the process-wide
+    option-chain limiter, so they are spaced against the live poll too.
+    """
+
+    def __init__(self, workers=2, keep=4, limiter=None):
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._busy = False
+        self._cache = {}     # snapshot_id -> Surface
+        self._keep = keep
+        self._latest = None
+        self.limiter = limiter or resilient.get_limiter("option_chain", UPSTREAM_SPACING)
+        self.last_error = None
+
+    def latest(self):
+        return self._latest
+
+    def get(self, snapshot_id):
+        return self._cache.get(snapshot_id)
+
+    def busy(self):
+        return self._busy
+
+    def refresh(self, snapshot_id, expiries, fetch_chain, now=None):
+        """
+        fetch_chain(expiry) -> (oc dict, spot) or None, called without any
+        spacing of its own. Skipped if a build is already running or this
+        snapshot is already cached.
+        """
+        with self._lock:
+            if self._busy or snapshot_id in self._cache:
+                return False
+            self._busy = True
+        threading.Thread(target=self._build, args=(snapshot_id, list(expiries), fetch_chain, now),
+                         daemon=True).start()
+        return True
+
+    def _build(self, snapshot_id, expiries, fetch_chain, now):
+        try:
+            futures = []
+            spot = None
+            for expiry in expiries:
+                self.limiter.wait()
+                got = fetch_chain(expiry)
+                if not got: continue
+                oc, spot = got
+                snap = parse_chain(oc, spot, expiry=expiry)
+                t = year_fraction(expiry, now)
+                futures.append(self._pool.submit(
+                    solve_expiry, expiry, float(spot), t, snap.strikes, snap.ce_ltp, snap.pe_ltp))
+
+            slices = [f.result() for f in futures]
+            if slices:
+                surface = Surface(snapshot_id, spot, slices)
+                self._cache[snapshot_id] = surface
+                for old in sorted(self._cache)[:-self._keep]:
+                    del self._cache[old]
+                self._latest = surface
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+        finally:
+            self._busy = False
+
+
+_builder = None
+
+
+def get_builder():
+    """Process-wide builder so Streamlit reruns share one pool."""
+    global _builder
+    if _builder is None:
+        _builder = SurfaceBuilder()
+    return _builder
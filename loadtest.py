@@ -0,0 +1,235 @@
+"""
+Multi-session load test for the Streamlit dashboards.
+
+Drives N concurrent headless sessions (streamlit.testing AppTest, which runs
+scripts on threads in this process just like the server does) against an
+in-process Dhan stub, and reports per-refresh latency, process CPU/RSS and
+upstream call counts as N grows.
+
+    python loadtest.py app_good.py --sessions 1 2 4 8 16 --rounds 5 --out report.md
+
+Each app ends its refresh with a long time.sleep(); the harness turns any
+sleep of a second or more on the script thread into the end of that refresh
+cycle. Background threads (rate limiter, builders) sleep for real.
+"""
+import argparse
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+
+_real_sleep = time.sleep
+CYCLE_SLEEP = 1.0       # Sleeps at least this long end a refresh cycle
+
+
+class CycleDone(Exception):
+    pass
+
+
+def _sleep(seconds):
+    # Only the app script's own end-of-run sleep ends a cycle; background
+    # threads (rate limiter, builders) really wait
+    if seconds >= CYCLE_SLEEP and threading.current_thread().name == "ScriptRunner.scriptThread":
+        raise CycleDone()
+    _real_sleep(seconds)
+
+
+# ---------------------------------------------------------
+# DHAN STUB
+# ---------------------------------------------------------
+class DhanStub:
+    """Synthetic dhanhq client: random-walk spot, 200-strike chain, fixed latency."""
+
+    calls = Counter()
+    _lock = threading.Lock()
+    latency = 0.05
+    strikes = 200
+
+    def __init__(self, client_id=None, access_token=None):
+        self._rng = np.random.default_rng()
+        self.spot = 24500.0
+
+    def _hit(self, endpoint):
+        with DhanStub._lock:
+            DhanStub.calls[endpoint] += 1
+        _real_sleep(self.latency)
+
+    def intraday_minute_data(self, security_id, exchange_segment, instrument_type, from_date=None, to_date=None):
+        self._hit("intraday_minute_data")
+        n = 375
+        close = self.spot + np.cumsum(self._rng.normal(0, 5, n))
+        start = int(datetime.now().replace(hour=9, minute=15, second=0).timestamp())
+        return {"status": "success", "data": {
+            "open": close.tolist(), "high": (close + 3).tolist(), "low": (close - 3).tolist(),
+            "close": close.tolist(), "volume": [0] * n, "timestamp": [start + 60 * i for i in range(n)],
+        }}
+
+    def expiry_list(self, under_security_id, under_exchange_segment):
+        self._hit("expiry_list")
+        today = datetime.now().date()
+        return {"status": "success", "data": {"data": [
+            str(today + timedelta(days=(1 - today.weekday()) % 7 + 7 * w)) for w in range(4)]}}
+
+    def option_chain(self, under_security_id, under_exchange_segment, expiry):
+        self._hit("option_chain")
+        self.spot += self._rng.normal(0, 10)
+        spot = self.spot
+        base = round(spot / 50) * 50 - 50 * (self.strikes // 2)
+        oc = {}
+        for i in range(self.strikes):
+            k = base + 50 * i
+            m = (k - spot) / spot
+            leg = lambda sign: {
+                "oi": int(self._rng.integers(1e4, 1e7)), "previous_oi": int(self._rng.integers(1e4, 1e7)),
+                "volume": int(self._rng.integers(0, 1e6)), "implied_volatility": 12 + 100 * m * m,
+                "last_price": max(sign * (spot - k), 0) + 60 * np.exp(-abs(m) * 30),
+                "greeks": {"delta": float(1 / (1 + np.exp(sign * m * 100))) - (sign < 0),
+                           "gamma": 0.001, "theta": -5.0, "vega": 10.0},
+            }
+            oc[f"{k:.6f}"] = {"ce": leg(1), "pe": leg(-1)}
+        return {"status": "success", "data": {"data": {"last_price": spot, "oc": oc}}}
+
+
+def install_stub():
+    # The end-of-cycle CycleDone is reported by Streamlit as an uncaught error
+    logging.getLogger("streamlit.runtime.scriptrunner.exec_code").setLevel(logging.CRITICAL)
+    module = types.ModuleType("dhanhq")
+    module.dhanhq = DhanStub
+    sys.modules["dhanhq"] = module
+    time.sleep = _sleep
+    # Poll as if the market were open, whatever the wall clock says
+    os.environ["NOM_ALWAYS_OPEN"] = "1"
+
+
+# ---------------------------------------------------------
+# PROCESS STATS
+# ---------------------------------------------------------
+def cpu_seconds():
+    r = resource.getrusage(resource.RUSAGE_SELF)
+    return r.ru_utime + r.ru_stime
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KB on Linux, bytes on macOS; peak rather than current
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+# ---------------------------------------------------------
+# SESSIONS
+# ---------------------------------------------------------
+def run_session(app_path, rounds, timeout, latencies, errors):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    at.secrets["dhan"] = {"client_id": "stub", "access_token": "stub"}
+    at.secrets["DHAN_ACCESS_TOKEN"] = "stub"
+    for _ in range(rounds):
+        start = time.perf_counter()
+        try:
+            at.run()
+        except Exception as e:
+            errors.append(repr(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+        for exc in at.exception:
+            trace = "\n".join(exc.stack_trace or [])
+            if "CycleDone" not in trace:
+                errors.append(f"{exc.message} @ {trace.splitlines()[-1] if trace else '?'}"[:200])
+
+
+def run_level(app_path, sessions, rounds, timeout):
+    latencies, errors = [], []
+    DhanStub.calls.clear()
+    cpu0, wall0 = cpu_seconds(), time.perf_counter()
+    threads = [threading.Thread(target=run_session, args=(app_path, rounds, timeout, latencies, errors))
+               for _ in range(sessions)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - wall0
+    cpu = cpu_seconds() - cpu0
+
+    lat = np.array(latencies) if latencies else np.array([np.nan])
+    refreshes = len(latencies)
+    return {
+        "sessions": sessions,
+        "refreshes": refreshes,
+        "p50_ms": 1000 * np.percentile(lat, 50),
+        "p95_ms": 1000 * np.percentile(lat, 95),
+        "max_ms": 1000 * lat.max(),
+        "refresh_per_s": refreshes / wall if wall else 0,
+        "cpu_ms_per_refresh": 1000 * cpu / refreshes if refreshes else np.nan,
+        "cpu_util": cpu / wall if wall else 0,
+        "rss_mb": rss_mb(),
+        "upstream_per_refresh": {k: round(v / max(refreshes, 1), 2) for k, v in sorted(DhanStub.calls.items())},
+        "errors": errors[:5],
+        "error_count": len(errors),
+    }
+
+
+def format_report(app, results):
+    lines = [
+        f"# Load test: {os.path.basename(app)}",
+        "",
+        f"Stub latency {DhanStub.latency * 1000:.0f} ms/call, {DhanStub.strikes} strikes. "
+        "Latency is one full script run (fetch -> analyze -> render).",
+        "",
+        "| Sessions | Refreshes | p50 ms | p95 ms | max ms | Refresh/s | CPU ms/refresh | CPU util | RSS MB | Upstream calls/refresh | Errors |",
+        "|---:|---:|---:|---:|---:|---:|---:|---:|---:|---|---:|",
+    ]
+    for r in results:
+        calls = ", ".join(f"{k}={v}" for k, v in r["upstream_per_refresh"].items())
+        lines.append(
+            f"| {r['sessions']} | {r['refreshes']} | {r['p50_ms']:.0f} | {r['p95_ms']:.0f} | {r['max_ms']:.0f} "
+            f"| {r['refresh_per_s']:.2f} | {r['cpu_ms_per_refresh']:.0f} | {r['cpu_util']:.2f} "
+            f"| {r['rss_mb']:.0f} | {calls} | {r['error_count']} |")
+    errors = [e for r in results for e in r["errors"]]
+    if errors:
+        lines += ["", "Sample errors:", ""] + [f"- `{e}`" for e in errors[:5]]
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("app", help="Dashboard script, e.g. app_good.py")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=3, help="Refreshes per session")
+    parser.add_argument("--latency", type=float, default=DhanStub.latency, help="Stub seconds per upstream call")
+    parser.add_argument("--strikes", type=int, default=DhanStub.strikes)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--out", help="Write the markdown report here as well")
+    args = parser.parse_args(argv)
+
+    DhanStub.latency = args.latency
+    DhanStub.strikes = args.strikes
+    install_stub()
+    app = os.path.abspath(args.app)
+
+    results = []
+    for n in args.sessions:
+        results.append(run_level(app, n, args.rounds, args.timeout))
+        print(f"{n} sessions: p95 {results[-1]['p95_ms']:.0f} ms", file=sys.stderr)
+
+    report = format_report(app, results)
+    print(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
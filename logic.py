@@ -1,41 +1,155 @@
+import numpy as np
+
+DELTA_BAND = (0.4, 0.65)
+
+# Relative weight of each score component (each component is in [0, 1])
+WEIGHTS = {"delta": 0.4, "oi": 0.3, "volume": 0.2, "iv": 0.1}
+
+
+# Leg field -> REST keys tried in order
+LEG_KEYS = {
+    "delta": ("delta",),
+    "oi_chg": ("oiChange",),
+    "volume": ("volume", "totalTradedVolume"),
+    "iv": ("iv", "impliedVolatility"),
+}
+ATM_WINDOW = 5      # Strikes either side of ATM that may be picked when spot is known
+
+
+def _leg(s, *names):
+    for name in names:
+        if s.get(name):
+            return s[name]
+    return {}
+
+
+def _first(leg, keys):
+    for k in keys:
+        if leg.get(k) is not None:
+            return leg[k]
+    return 0.0
+
+
+def _row(s):
+    """Strike, then each call field, then each put field, for one strike."""
+    call, put = _leg(s, "call", "ce"), _leg(s, "put", "pe")
+    yield s["strikePrice"]
+    for leg in (call, put):
+        for keys in LEG_KEYS.values():
+            yield _first(leg, keys)
+
+
+def chain_arrays(option_chain):
+    """
+    Flattens the REST option chain into per-leg arrays, sorted by strike.
+    Accepts rows under data (list) or data.oc, with call/put or ce/pe legs.
+    The whole chain goes through one np.fromiter pass into an (n, 9) block;
+    the columns are views onto it.
+    """
+    rows = option_chain["data"]
+    if isinstance(rows, dict):
+        rows = rows.get("oc", [])
+    width = 1 + 2 * len(LEG_KEYS)
+    block = np.fromiter((v for s in rows for v in _row(s)), dtype=float,
+                        count=len(rows) * width).reshape(len(rows), width)
+    block = block[np.argsort(block[:, 0], kind="stable")]
+
+    out = {"strikes": block[:, 0]}
+    for j, name in enumerate(LEG_KEYS):
+        out[f"call_{name}"] = block[:, 1 + j]
+        out[f"put_{name}"] = block[:, 1 + len(LEG_KEYS) + j]
+    return out
+
+
+def near_atm(strikes, spot, window=ATM_WINDOW):
+    """Mask of strikes within `window` strikes of the one nearest `spot`."""
+    if not len(strikes):
+        return np.zeros(0, dtype=bool)
+    atm = int(np.abs(strikes - spot).argmin())
+    idx = np.arange(len(strikes))
+    return np.abs(idx - atm) <= window
+
+
+def _pct_rank(x):
+    """
+    Percentile rank in [0, 1]. Tied values share their average rank, so a
+    constant (e.g. all-zero volume) column gives every strike 0.5 rather
+    than favouring later positions.
+    """
+    if len(x) < 2:
+        return np.ones(len(x))
+    _, inverse, counts = np.unique(x, return_inverse=True, return_counts=True)
+    first = np.cumsum(counts) - counts          # Sorted position of each value's first copy
+    return ((first + (counts - 1) / 2) / (len(x) - 1))[inverse]
+
+
+def _band_fit(delta, lo, hi):
+    """1 at the band centre, falling to 0 at its edges, 0 outside."""
+    mid, half = (lo + hi) / 2, (hi - lo) / 2
+    return np.clip(1 - np.abs(delta - mid) / half, 0, 1) * ((delta >= lo) & (delta <= hi))
+
+
+def score_legs(call_delta, put_delta, call_oi_chg, put_oi_chg,
+               call_volume, put_volume, call_iv, put_iv, band=DELTA_BAND, weights=WEIGHTS):
+    """
+    Scores every strike's call and put leg at once. A leg is eligible only if
+    its delta is in band, its own OI is rising and the opposite leg's OI is
+    falling; ineligible legs score -inf. Returns (call_score, put_score).
+    """
+    lo, hi = band
+    call_ok = (call_delta >= lo) & (call_delta <= hi) & (call_oi_chg > 0) & (put_oi_chg < 0)
+    put_ok = (put_delta >= -hi) & (put_delta <= -lo) & (put_oi_chg > 0) & (call_oi_chg < 0)
+
+    # OI direction strength: how lopsided the change is, rank-normalised
+    oi_call = _pct_rank(call_oi_chg - put_oi_chg)
+    oi_put = _pct_rank(put_oi_chg - call_oi_chg)
+
+    call_score = (weights["delta"] * _band_fit(call_delta, lo, hi)
+                  + weights["oi"] * oi_call
+                  + weights["volume"] * _pct_rank(call_volume)
+                  + weights["iv"] * (1 - _pct_rank(call_iv)))   # Cheaper vol is better to buy
+    put_score = (weights["delta"] * _band_fit(-put_delta, lo, hi)
+                 + weights["oi"] * oi_put
+                 + weights["volume"] * _pct_rank(put_volume)
+                 + weights["iv"] * (1 - _pct_rank(put_iv)))
+
+    return np.where(call_ok, call_score, -np.inf), np.where(put_ok, put_score, -np.inf)
+
+
+def top_k(strikes, scores, k):
+    """Best `k` eligible (strike, score) pairs, highest first, via argpartition."""
+    eligible = np.flatnonzero(np.isfinite(scores))
+    if not len(eligible):
+        return []
+    k = min(k, len(eligible))
+    part = eligible[np.argpartition(-scores[eligible], k - 1)[:k]]
+    best = part[np.argsort(-scores[part], kind="stable")]
+    return [(float(strikes[i]), round(float(scores[i]), 4)) for i in best]
+
+
+def rank_strikes(option_chain, spot=None, k=3, window=ATM_WINDOW):
+    """
+    Top-k call and put candidates. Every strike is scored; when `spot` is
+    given only those within `window` strikes of ATM can be picked.
+    """
+    a = chain_arrays(option_chain)
+    call_score, put_score = score_legs(
+        a["call_delta"], a["put_delta"], a["call_oi_chg"], a["put_oi_chg"],
+        a["call_volume"], a["put_volume"], a["call_iv"], a["put_iv"])
+    if spot is not None:
+        near = near_atm(a["strikes"], spot, window)
+        call_score = np.where(near, call_score, -np.inf)
+        put_score = np.where(near, put_score, -np.inf)
+    return {"call": top_k(a["strikes"], call_score, k), "put": top_k(a["strikes"], put_score, k)}
+
+
 def find_signal(option_chain, spot):
+    ranked = rank_strikes(option_chain, spot, k=1)
+
+    if ranked["call"]:
+        return "BUY CALL", ranked["call"][0][0]
 
-    strikes = option_chain["data"]
-    
-    # Find ATM strike
-    atm = min(strikes, key=lambda x: abs(x["strikePrice"] - spot))
-    idx = strikes.index(atm)
-
-    # ATM ± 1 strikes
-    candidates = strikes[idx-1:idx+2]
-
-    best_call = None
-    best_put = None
-
-    for s in candidates:
-        ce = s["call"]
-        pe = s["put"]
-
-        # Bullish logic
-        if (
-            0.4 <= ce["delta"] <= 0.65 and
-            ce["oiChange"] > 0 and
-            pe["oiChange"] < 0
-        ):
-            best_call = s["strikePrice"]
-
-        # Bearish logic
-        if (
-            -0.65 <= pe["delta"] <= -0.4 and
-            pe["oiChange"] > 0 and
-            ce["oiChange"] < 0
-        ):
-            best_put = s["strikePrice"]
-
-    if best_call:
-        return "BUY CALL", best_call
-
-    if best_put:
-        return "BUY PUT", best_put
+    if ranked["put"]:
+        return "BUY PUT", ranked["put"][0][0]
 
     return "NO TRADE", None
@@ -0,0 +1,223 @@
+"""
+Lightweight in-process metrics for the refresh cycle.
+
+Stage timers, per-endpoint latency histograms, error/throttle counters and
+snapshot staleness. Exposed as Prometheus text (optional HTTP endpoint) and
+as a Streamlit diagnostics panel. Every hook is a no-op unless
+NOM_METRICS=1 is set or `enable()` is called.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("NOM_METRICS", "0") == "1"
+METRICS_PORT = int(os.environ.get("NOM_METRICS_PORT", "0"))  # 0 = no endpoint
+
+# Seconds. Covers fast in-memory stages up to slow upstream calls.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Dhan reports rate limiting as DH-904 in `remarks`
+THROTTLE_MARKERS = ("DH-904", "rate limit", "Too many requests")
+
+_lock = threading.Lock()
+_histograms = {}    # (name, labels) -> [bucket_counts, sum, count]
+_counters = {}      # (name, labels) -> value
+_gauges = {}        # (name, labels) -> value
+_server = None
+_NOOP = nullcontext()
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    if not ENABLED: return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        hist[0][bisect_left(BUCKETS, value)] += 1
+        hist[1] += value
+        hist[2] += 1
+
+
+def inc(name, amount=1, **labels):
+    if not ENABLED: return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    if not ENABLED: return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+@contextmanager
+def _timer(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def stage(name):
+    """`with metrics.stage("parse"): ...` -- times one stage of the refresh."""
+    if not ENABLED: return _NOOP
+    return _timer("nom_stage_seconds", {"stage": name})
+
+
+def call(endpoint, fn, *args, **kwargs):
+    """
+    Runs a Dhan SDK call, recording latency per endpoint plus error and
+    throttle counters. Exceptions are re-raised unchanged.
+    """
+    if not ENABLED: return fn(*args, **kwargs)
+
+    start = time.perf_counter()
+    try:
+        resp = fn(*args, **kwargs)
+    except Exception:
+        inc("nom_upstream_errors_total", endpoint=endpoint)
+        raise
+    finally:
+        observe("nom_upstream_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+    inc("nom_upstream_requests_total", endpoint=endpoint)
+    if isinstance(resp, dict) and resp.get('status') != 'success':
+        remarks = str(resp.get('remarks', ''))
+        if any(m.lower() in remarks.lower() for m in THROTTLE_MARKERS):
+            inc("nom_upstream_throttled_total", endpoint=endpoint)
+        else:
+            inc("nom_upstream_errors_total", endpoint=endpoint)
+    return resp
+
+
+def mark_snapshot():
+    """Records the wall-clock time of the last good option-chain snapshot."""
+    set_gauge("nom_last_snapshot_timestamp", time.time())
+
+
+def staleness():
+    ts = _gauges.get(("nom_last_snapshot_timestamp", ()))
+    return None if ts is None else time.time() - ts
+
+
+# ---------------------------------------------------------
+# EXPORT
+# ---------------------------------------------------------
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items: return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        hists = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+        gauges = dict(_gauges)
+
+    seen = set()
+    for (name, labels), (buckets, total, count) in hists:
+        if name not in seen:
+            lines.append(f"# TYPE {name} histogram")
+            seen.add(name)
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), buckets):
+            cumulative += n
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+
+    for (name, labels), value in counters:
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    age = staleness()
+    if age is not None:
+        gauges[("nom_snapshot_age_seconds", ())] = round(age, 3)
+    for (name, labels), value in sorted(gauges.items()):
+        if name not in seen:
+            lines.append(f"# TYPE {name} gauge")
+            seen.add(name)
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port=None):
+    """Starts the /metrics endpoint once per process (safe across reruns)."""
+    global _server
+    port = METRICS_PORT if port is None else port
+    if not ENABLED or not port or _server is not None:
+        return _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def stage_summary():
+    """Rows of (metric, labels, count, mean ms, sum s) for the diagnostics panel."""
+    with _lock:
+        hists = sorted(_histograms.items())
+    rows = []
+    for (name, labels), (_, total, count) in hists:
+        rows.append({
+            "Metric": name,
+            "Labels": ", ".join(f"{k}={v}" for k, v in labels),
+            "Count": count,
+            "Mean (ms)": round(1000 * total / count, 2) if count else 0,
+            "Total (s)": round(total, 3),
+        })
+    return rows
+
+
+def render_panel(st):
+    """Collapsible diagnostics panel; renders nothing when metrics are off."""
+    if not ENABLED: return
+    with st.expander("🩺 Diagnostics", expanded=False):
+        age = staleness()
+        c1, c2 = st.columns(2)
+        c1.metric("Snapshot Age", f"{age:.1f}s" if age is not None else "n/a")
+        with _lock:
+            errors = sum(v for (n, _), v in _counters.items() if n == "nom_upstream_errors_total")
+            throttled = sum(v for (n, _), v in _counters.items() if n == "nom_upstream_throttled_total")
+        c2.metric("Upstream Errors / Throttles", f"{errors} / {throttled}")
+        st.dataframe(stage_summary(), use_container_width=True)
+        if _server is not None:
+            st.caption(f"Prometheus endpoint: :{_server.server_address[1]}/metrics")
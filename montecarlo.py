@@ -0,0 +1,122 @@
+"""
+Monte Carlo probabilities for wall touches and expiry ranges.
+
+Spot follows GBM at the chain's ATM implied volatility up to expiry. Paths
+are simulated in float32 chunks, one step at a time, so memory stays at a
+few arrays of chunk size whatever the path count. Barrier touches between
+steps are handled with the Brownian-bridge crossing probability rather than
+a max over the discrete points, so a handful of steps is enough. Chunks run
+in a spawn process pool (inline on a single core), each with its own
+SeedSequence stream.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from iv_surface import RISK_FREE
+
+PATHS = int(os.environ.get("NOM_MC_PATHS", "1000000"))
+STEPS = 8               # The bridge makes touches exact per step, so few are needed
+CHUNK = 125_000
+WORKERS = os.cpu_count() or 1
+HIST_SIGMAS = 6         # Terminal histogram spans ±6 sd in log space
+HIST_BINS = 600
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def simulate_chunk(seed, paths, spot, sigma, t, barriers, steps=STEPS, r=RISK_FREE):
+    """
+    One chunk of paths. `barriers` are price levels; each is treated as above
+    or below spot by where it sits now. Returns (touch probability sums,
+    finish-beyond counts, terminal log-return histogram).
+    """
+    rng = np.random.default_rng(seed)
+    dt = t / steps
+    vol = np.float32(sigma * np.sqrt(dt))
+    drift = np.float32((r - 0.5 * sigma * sigma) * dt)
+    logb = np.log(np.asarray(barriers, dtype=np.float64) / spot).astype(np.float32)
+    above = logb > 0
+    two_over_var = np.float32(2 / (sigma * sigma * dt))
+
+    x = np.zeros(paths, dtype=np.float32)           # log(S / spot)
+    survive = np.ones((len(logb), paths), dtype=np.float32)
+    # Distance to each barrier on the spot side, floored at 0 (0 = crossed)
+    prev = [np.full(paths, abs(b), dtype=np.float32) for b in logb]
+    for _ in range(steps):
+        x += drift + vol * rng.standard_normal(paths, dtype=np.float32)
+        for j, b in enumerate(logb):
+            dist = b - x if above[j] else x - b
+            np.maximum(dist, 0, out=dist)
+            # Bridge crossing probability exp(-2 d0 d1 / var); 1 once either end is across
+            cross = np.exp(-two_over_var * prev[j] * dist)
+            survive[j] *= 1 - cross
+            prev[j] = dist
+
+    touched = (1 - survive).sum(axis=1, dtype=np.float64)
+    beyond = np.array([(x > b).sum() if up else (x < b).sum() for b, up in zip(logb, above)], dtype=np.float64)
+    edge = HIST_SIGMAS * sigma * np.sqrt(t)
+    hist, _ = np.histogram(x, bins=HIST_BINS, range=(-edge, edge))
+    return touched, beyond, hist
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None and WORKERS > 1:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def simulate(spot, sigma, t, levels, paths=PATHS, steps=STEPS, seed=None):
+    """
+    `levels` maps a name to a price, e.g. {"Call Wall": 24800, ...}. Returns
+    {"levels": DataFrame, "range": DataFrame, "paths", "elapsed"}.
+    """
+    start = time.perf_counter()
+    names = [n for n, v in levels.items() if v and v > 0]
+    barriers = [float(levels[n]) for n in names]
+    sizes = [CHUNK] * (paths // CHUNK) + ([paths % CHUNK] if paths % CHUNK else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(s, n, float(spot), float(sigma), float(t), barriers, steps) for s, n in zip(seeds, sizes)]
+
+    pool = _get_pool()
+    results = None
+    if pool is not None and len(args) > 1:
+        try:
+            results = list(pool.map(simulate_chunk, *zip(*args)))
+        except (BrokenProcessPool, OSError):
+            results = None
+    if results is None:
+        results = [simulate_chunk(*a) for a in args]
+
+    touched = sum(r[0] for r in results)
+    beyond = sum(r[1] for r in results)
+    hist = sum(r[2] for r in results)
+
+    edge = HIST_SIGMAS * sigma * np.sqrt(t)
+    bin_edges = np.linspace(-edge, edge, HIST_BINS + 1)
+    cdf = np.concatenate(([0], np.cumsum(hist))) / max(hist.sum(), 1)
+    prices = spot * np.exp(np.interp(QUANTILES, cdf, bin_edges))
+
+    return {
+        "levels": pd.DataFrame({
+            "Level": names,
+            "Price": barriers,
+            "Side": ["above" if b > spot else "below" for b in barriers],
+            "P(touch)": touched / paths if names else [],
+            "P(close beyond)": beyond / paths if names else [],
+        }),
+        "range": pd.DataFrame({"Quantile": [f"{q:.0%}" for q in QUANTILES], "Spot at Expiry": prices.round(1)}),
+        "paths": paths,
+        "elapsed": time.perf_counter() - start,
+    }
@@ -0,0 +1,178 @@
+"""
+Compact in-memory per-strike OI history for the whole chain.
+
+Each poll stores OI as int32 deltas against the previous poll, with a full
+int64 keyframe every `keyframe_every` polls (or whenever the strike grid
+changes / a delta would overflow). Prices are kept as float32. A full day of
+200-strike polls fits in a few MB, and any poll can be rebuilt from its
+keyframe with a short column sum.
+"""
+import numpy as np
+import pandas as pd
+
+INT32_MAX = np.iinfo(np.int32).max
+
+
+class _Segment:
+    """A keyframe plus up to `size` delta rows on one fixed strike grid."""
+
+    def __init__(self, start, strikes, ce_oi, pe_oi, size):
+        n = len(strikes)
+        self.start = start
+        self.strikes = strikes
+        self.key_ce = ce_oi.astype(np.int64)
+        self.key_pe = pe_oi.astype(np.int64)
+        self.d_ce = np.zeros((size, n), dtype=np.int32)
+        self.d_pe = np.zeros((size, n), dtype=np.int32)
+        self.ce_ltp = np.zeros((size, n), dtype=np.float32)
+        self.pe_ltp = np.zeros((size, n), dtype=np.float32)
+        self.rows = 0
+        self._last_ce = self.key_ce
+        self._last_pe = self.key_pe
+
+    def full(self):
+        return self.rows == len(self.d_ce)
+
+    def try_append(self, strikes, ce_oi, pe_oi, ce_ltp, pe_ltp):
+        if self.full() or len(strikes) != len(self.strikes) or not np.array_equal(strikes, self.strikes):
+            return False
+        d_ce = ce_oi - self._last_ce
+        d_pe = pe_oi - self._last_pe
+        if self.rows and (np.abs(d_ce).max(initial=0) > INT32_MAX or np.abs(d_pe).max(initial=0) > INT32_MAX):
+            return False
+        r = self.rows
+        if r:
+            self.d_ce[r] = d_ce
+            self.d_pe[r] = d_pe
+        self.ce_ltp[r] = ce_ltp
+        self.pe_ltp[r] = pe_ltp
+        self._last_ce = ce_oi
+        self._last_pe = pe_oi
+        self.rows += 1
+        return True
+
+    def oi(self, side):
+        """(rows x strikes) absolute OI rebuilt from keyframe + cumulative deltas."""
+        key, d = (self.key_ce, self.d_ce) if side == "ce" else (self.key_pe, self.d_pe)
+        return key + np.cumsum(d[:self.rows], axis=0, dtype=np.int64)
+
+    def trim(self):
+        """Drops unused preallocated rows once the segment is closed."""
+        for name in ("d_ce", "d_pe", "ce_ltp", "pe_ltp"):
+            setattr(self, name, getattr(self, name)[:self.rows].copy())
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.strikes, self.key_ce, self.key_pe,
+                                       self.d_ce, self.d_pe, self.ce_ltp, self.pe_ltp))
+
+
+class OIHistory:
+    def __init__(self, keyframe_every=32):
+        self.keyframe_every = keyframe_every
+        self._segments = []
+        self._times = []
+        self._spot = []
+
+    def __len__(self):
+        return len(self._times)
+
+    def append(self, ts, strikes, ce_oi, pe_oi, ce_ltp, pe_ltp, spot=np.nan):
+        """Adds one poll. `ts` is epoch seconds; arrays are aligned with `strikes` (sorted)."""
+        strikes = np.asarray(strikes, dtype=float)
+        ce_oi = np.asarray(ce_oi, dtype=np.int64)
+        pe_oi = np.asarray(pe_oi, dtype=np.int64)
+
+        seg = self._segments[-1] if self._segments else None
+        if seg is None or not seg.try_append(strikes, ce_oi, pe_oi, ce_ltp, pe_ltp):
+            if seg is not None:
+                seg.trim()
+            seg = _Segment(len(self._times), strikes, ce_oi, pe_oi, self.keyframe_every)
+            seg.try_append(strikes, ce_oi, pe_oi, ce_ltp, pe_ltp)
+            self._segments.append(seg)
+
+        self._times.append(float(ts))
+        self._spot.append(float(spot))
+
+    def append_snapshot(self, ts, snap):
+        self.append(ts, snap.strikes, snap.ce_oi, snap.pe_oi, snap.ce_ltp, snap.pe_ltp, snap.ltp)
+
+    @property
+    def times(self):
+        return np.asarray(self._times)
+
+    @property
+    def spot(self):
+        return np.asarray(self._spot, dtype=np.float32)
+
+    def index_at(self, ts):
+        """Index of the last poll at or before `ts` (0 if before the first)."""
+        return max(int(np.searchsorted(self._times, ts, side="right")) - 1, 0)
+
+    def _segment_for(self, i):
+        starts = [s.start for s in self._segments]
+        return self._segments[int(np.searchsorted(starts, i, side="right")) - 1]
+
+    def oi_at(self, strike, i, side="ce"):
+        """OI at `strike` on poll `i` (0 if the strike was not listed then)."""
+        seg = self._segment_for(i)
+        j = int(np.searchsorted(seg.strikes, strike))
+        if j >= len(seg.strikes) or seg.strikes[j] != strike:
+            return 0
+        off = i - seg.start
+        key, d = (seg.key_ce, seg.d_ce) if side == "ce" else (seg.key_pe, seg.d_pe)
+        return int(key[j] + d[1:off + 1, j].sum(dtype=np.int64))
+
+    def oi_change(self, strike, t1, t2, side="ce"):
+        """OI change at `strike` between times t1 and t2 (epoch seconds)."""
+        if not self._times: return 0
+        i1, i2 = self.index_at(t1), self.index_at(t2)
+        return self.oi_at(strike, i2, side) - self.oi_at(strike, i1, side)
+
+    def snapshot(self, i):
+        seg = self._segment_for(i)
+        off = i - seg.start
+        return {
+            "time": self._times[i],
+            "strikes": seg.strikes,
+            "ce_oi": seg.key_ce + seg.d_ce[1:off + 1].sum(axis=0, dtype=np.int64),
+            "pe_oi": seg.key_pe + seg.d_pe[1:off + 1].sum(axis=0, dtype=np.int64),
+            "ce_ltp": seg.ce_ltp[off],
+            "pe_ltp": seg.pe_ltp[off],
+        }
+
+    def matrix(self, strikes, side="ce"):
+        """
+        (polls x len(strikes)) absolute OI on a fixed strike grid; strikes not
+        listed in a given poll are 0.
+        """
+        strikes = np.asarray(strikes, dtype=float)
+        out = np.zeros((len(self._times), len(strikes)), dtype=np.int64)
+        for seg in self._segments:
+            pos = np.clip(np.searchsorted(seg.strikes, strikes), 0, len(seg.strikes) - 1)
+            hit = seg.strikes[pos] == strikes
+            out[seg.start:seg.start + seg.rows, hit] = seg.oi(side)[:, pos[hit]]
+        return out
+
+    def iter_frames(self):
+        """
+        Long-form (Time, Strike, CE OI, PE OI, CE LTP, PE LTP) frames, one per
+        segment, over the polls recorded when iteration starts.
+        """
+        segments = [(seg, seg.rows) for seg in self._segments]
+        times = np.asarray(self._times)
+
+        def frames():
+            for seg, rows in segments:
+                n = len(seg.strikes)
+                yield pd.DataFrame({
+                    "Time": np.repeat(times[seg.start:seg.start + rows], n),
+                    "Strike": np.tile(seg.strikes, rows),
+                    "CE OI": seg.oi("ce")[:rows].ravel(),
+                    "PE OI": seg.oi("pe")[:rows].ravel(),
+                    "CE LTP": seg.ce_ltp[:rows].ravel(),
+                    "PE LTP": seg.pe_ltp[:rows].ravel(),
+                })
+        return frames()
+
+    def nbytes(self):
+        return sum(s.nbytes() for s in self._segments) + 16 * len(self._times)
@@ -0,0 +1,166 @@
+"""
+Paper trading on signals.
+
+Positions live in parallel NumPy arrays, so marking every open position to
+market on a snapshot (and checking its stop/target) is one vectorised pass
+regardless of how many are open. Works the same live and in `replay()`.
+"""
+import numpy as np
+import pandas as pd
+
+LOT_SIZE = 75           # NIFTY contract size; override per book
+
+CE, PE = 0, 1
+BULLISH = ("BUY CALL", "SCALP BUY", "STRONG BUY", "BUY (Caution)")
+BEARISH = ("BUY PUT", "SCALP SELL", "STRONG SELL")
+
+
+def signal_to_leg(signal):
+    """CE for bullish signals, PE for bearish ones, None otherwise."""
+    if any(s in signal for s in BULLISH): return CE
+    if any(s in signal for s in BEARISH): return PE
+    return None
+
+
+class PaperBook:
+    def __init__(self, lots=1, lot_size=LOT_SIZE, slippage=0.5, stop_pct=0.3, target_pct=0.6,
+                 max_open=500, capital=0.0):
+        self.lots = lots
+        self.lot_size = lot_size
+        self.slippage = slippage          # Points per side
+        self.stop_pct = stop_pct          # Of entry premium
+        self.target_pct = target_pct
+        self.max_open = max_open
+        self.capital = capital
+        self.last_signal = None
+
+        self._n = 0
+        self._cap = 0
+        self._cols = {}
+        self._grow(64)
+        self.realized = 0.0
+        self.equity = []                  # (ts, realized + unrealized)
+
+    # Column name -> dtype; one array per column, rows are positions
+    _SCHEMA = {
+        "strike": float, "leg": np.int8, "qty": float, "entry": float, "stop": float,
+        "target": float, "entry_ts": float, "last_px": float, "exit": float, "exit_ts": float,
+        "is_open": bool, "signal": object,
+    }
+
+    def _grow(self, cap):
+        for name, dtype in self._SCHEMA.items():
+            new = np.zeros(cap, dtype=dtype)
+            if name in self._cols:
+                new[:self._n] = self._cols[name][:self._n]
+            self._cols[name] = new
+        self._cap = cap
+
+    def __getattr__(self, name):
+        cols = self.__dict__.get("_cols", {})
+        if name in cols:
+            return cols[name][:self._n]
+        raise AttributeError(name)
+
+    @property
+    def open_count(self):
+        return int(self.is_open.sum())
+
+    def open_position(self, ts, strike, leg, price, signal=""):
+        """Buys `lots` of the option at `price` plus slippage."""
+        if price <= 0 or self.open_count >= self.max_open:
+            return None
+        if self._n == self._cap:
+            self._grow(self._cap * 2)
+        i = self._n
+        entry = price + self.slippage
+        c = self._cols
+        c["strike"][i], c["leg"][i], c["qty"][i] = strike, leg, self.lots * self.lot_size
+        c["entry"][i], c["last_px"][i], c["entry_ts"][i] = entry, entry, ts
+        c["stop"][i] = entry * (1 - self.stop_pct)
+        c["target"][i] = entry * (1 + self.target_pct)
+        c["is_open"][i], c["signal"][i] = True, signal
+        self._n += 1
+        return i
+
+    def on_signal(self, ts, signal, snap, strike=None):
+        """Opens a position when the signal changes to a tradeable one (ATM unless `strike`)."""
+        if signal == self.last_signal:
+            return None
+        self.last_signal = signal
+        leg = signal_to_leg(signal)
+        if leg is None:
+            return None
+        j = snap.atm_idx if strike is None else int(np.abs(snap.strikes - strike).argmin())
+        price = (snap.ce_ltp if leg == CE else snap.pe_ltp)[j]
+        return self.open_position(ts, float(snap.strikes[j]), leg, float(price), signal)
+
+    def mark(self, ts, strikes, ce_ltp, pe_ltp):
+        """
+        Marks all open positions to the snapshot prices, closes those through
+        stop or target (at the mark less slippage) and appends to the equity curve.
+        """
+        n = self._n
+        c = self._cols
+        live = c["is_open"][:n]
+        if live.any():
+            idx = np.flatnonzero(live)
+            pos = np.clip(np.searchsorted(strikes, c["strike"][idx]), 0, len(strikes) - 1)
+            listed = strikes[pos] == c["strike"][idx]
+            px = np.where(c["leg"][idx] == CE, ce_ltp[pos], pe_ltp[pos])
+            # Unlisted / zero quotes keep the previous mark
+            px = np.where(listed & (px > 0), px, c["last_px"][idx])
+            c["last_px"][idx] = px
+
+            hit = (px <= c["stop"][idx]) | (px >= c["target"][idx])
+            if hit.any():
+                closing = idx[hit]
+                c["exit"][closing] = np.maximum(px[hit] - self.slippage, 0)
+                c["exit_ts"][closing] = ts
+                c["is_open"][closing] = False
+                self.realized += float(((c["exit"][closing] - c["entry"][closing]) * c["qty"][closing]).sum())
+
+        self.equity.append((ts, self.capital + self.realized + self.unrealized()))
+
+    def mark_snapshot(self, ts, snap):
+        self.mark(ts, snap.strikes, snap.ce_ltp, snap.pe_ltp)
+
+    def unrealized(self):
+        o = self.is_open
+        return float(((self.last_px[o] - self.entry[o]) * self.qty[o]).sum())
+
+    def close_all(self, ts):
+        o = np.flatnonzero(self.is_open)
+        c = self._cols
+        c["exit"][o] = np.maximum(c["last_px"][o] - self.slippage, 0)
+        c["exit_ts"][o] = ts
+        c["is_open"][o] = False
+        self.realized += float(((c["exit"][o] - c["entry"][o]) * c["qty"][o]).sum())
+
+    def positions(self):
+        pnl = np.where(self.is_open, self.last_px - self.entry, self.exit - self.entry) * self.qty
+        return pd.DataFrame({
+            "Opened": pd.to_datetime(self.entry_ts, unit="s", utc=True).tz_convert("Asia/Kolkata"),
+            "Signal": self.signal, "Strike": self.strike,
+            "Leg": np.where(self.leg == CE, "CE", "PE"), "Qty": self.qty,
+            "Entry": self.entry.round(2), "Mark": self.last_px.round(2),
+            "Exit": np.where(self.is_open, np.nan, self.exit).round(2),
+            "P&L": pnl.round(2), "Open": self.is_open,
+        })
+
+    def equity_curve(self):
+        df = pd.DataFrame(self.equity, columns=["ts", "Equity"])
+        df["Time"] = pd.to_datetime(df["ts"], unit="s", utc=True).dt.tz_convert("Asia/Kolkata")
+        return df[["Time", "Equity"]]
+
+
+def replay(book, events):
+    """
+    Drives a book through recorded history. `events` yields
+    (ts, snap, signal) in time order; returns the book.
+    """
+    for ts, snap, signal in events:
+        book.mark_snapshot(ts, snap)
+        if signal:
+            book.on_signal(ts, signal, snap)
+    return book
@@ -0,0 +1,253 @@
+"""
+Multi-leg option structures priced off the live chain.
+
+A batch of S structures with up to MAX_LEGS legs is held as (S, legs)
+arrays: strike, call/put, signed lots, entry premium and IV (unused leg
+slots have zero quantity). Expiry and T+0 payoffs over a spot grid and the
+aggregate greeks are broadcast over (S, legs, grid), so the few hundred
+spreads, strangles and condors built around the gamma walls are priced and
+ranked in one pass per refresh.
+"""
+import numpy as np
+import pandas as pd
+
+from iv_surface import RISK_FREE, bs_delta, bs_gamma, bs_price, bs_theta, bs_vega
+from paper import LOT_SIZE
+
+MAX_LEGS = 4
+GRID_SIGMAS = 4         # Spot grid spans ±4 standard deviations to expiry
+GRID_POINTS = 321
+DEFAULT_IV = 0.15
+TAIL = 0.05                     # CVaR tail mass used as the risk in the score
+MIN_RISK = 0.1                  # Risk floor as a fraction of gross premium, so riskless rows stay finite
+OFFSETS = (-2, -1, 0, 1, 2)     # Strike steps around each anchor (ATM / walls)
+WIDTHS = (1, 2, 3, 4)           # Wing widths in strike steps
+
+
+class Structures:
+    """S structures x MAX_LEGS legs; `qty` is signed lots (+ long, - short)."""
+
+    def __init__(self, names, strike, is_call, qty, premium=None, iv=None):
+        self.names = list(names)
+        self.strike = strike
+        self.is_call = is_call
+        self.qty = qty
+        self.premium = np.zeros_like(strike) if premium is None else premium
+        self.iv = np.zeros_like(strike) if iv is None else iv
+
+    @classmethod
+    def from_legs(cls, specs):
+        """`specs` is [(name, [(strike, is_call, qty), ...]), ...]."""
+        n = len(specs)
+        strike = np.ones((n, MAX_LEGS))         # Padding strike 1 keeps log() finite
+        is_call = np.zeros((n, MAX_LEGS), dtype=bool)
+        qty = np.zeros((n, MAX_LEGS))
+        for i, (_, legs) in enumerate(specs):
+            for j, (k, call, q) in enumerate(legs):
+                strike[i, j], is_call[i, j], qty[i, j] = k, call, q
+        return cls([name for name, _ in specs], strike, is_call, qty)
+
+    def __len__(self):
+        return len(self.names)
+
+    def take(self, idx):
+        idx = np.asarray(idx)
+        return Structures([self.names[i] for i in idx], self.strike[idx].copy(), self.is_call[idx].copy(),
+                          self.qty[idx].copy(), self.premium[idx].copy(), self.iv[idx].copy())
+
+    def price(self, snap, fallback_iv=DEFAULT_IV):
+        """
+        Fills entry premium (LTP) and IV for every leg from the chain; returns a
+        mask of structures whose legs are all listed with a price.
+        """
+        pos = np.clip(np.searchsorted(snap.strikes, self.strike), 0, max(len(snap) - 1, 0))
+        used = self.qty != 0
+        listed = snap.strikes[pos] == self.strike
+        ltp = np.where(self.is_call, snap.ce_ltp[pos], snap.pe_ltp[pos])
+        iv = np.where(self.is_call, snap.ce_iv[pos], snap.pe_iv[pos]) / 100
+        self.premium = np.where(used, ltp, 0.0)
+        self.iv = np.where(iv > 0, iv, fallback_iv)
+        return np.all(~used | (listed & (ltp > 0)), axis=1)
+
+    @property
+    def net_premium(self):
+        """Per unit: positive is a debit paid, negative a credit received."""
+        return (self.qty * self.premium).sum(axis=1)
+
+    def describe(self):
+        """Leg text per structure, e.g. '-1 24600 CE / +1 24700 CE'."""
+        out = []
+        for i in range(len(self)):
+            legs = [f"{q:+.0f} {k:.0f} {'CE' if c else 'PE'}"
+                    for k, c, q in zip(self.strike[i], self.is_call[i], self.qty[i]) if q]
+            out.append(" / ".join(legs))
+        return out
+
+
+# ---------------------------------------------------------
+# PAYOFF & GREEKS (broadcast over structures x legs x grid)
+# ---------------------------------------------------------
+def spot_grid(spot, t, iv, sigmas=GRID_SIGMAS, points=GRID_POINTS):
+    """Log-spaced spot grid ±`sigmas` standard deviations; also returns the z of each point."""
+    z = np.linspace(-sigmas, sigmas, points)
+    return spot * np.exp(z * iv * np.sqrt(t)), z
+
+
+def payoff_at_expiry(structs, grid, lot_size=LOT_SIZE):
+    """(S, grid) P&L at expiry."""
+    k = structs.strike[:, :, None]
+    intrinsic = np.where(structs.is_call[:, :, None], np.maximum(grid - k, 0), np.maximum(k - grid, 0))
+    return ((intrinsic - structs.premium[:, :, None]) * structs.qty[:, :, None]).sum(axis=1) * lot_size
+
+
+def payoff_now(structs, grid, t, lot_size=LOT_SIZE):
+    """(S, grid) P&L if spot moved to each grid point right now (T+0, IV unchanged)."""
+    value = bs_price(grid, structs.strike[:, :, None], t, structs.iv[:, :, None], structs.is_call[:, :, None])
+    return ((value - structs.premium[:, :, None]) * structs.qty[:, :, None]).sum(axis=1) * lot_size
+
+
+def greeks(structs, spot, t, lot_size=LOT_SIZE):
+    """Aggregate position greeks at `spot`, one row per structure."""
+    k, iv, call = structs.strike, structs.iv, structs.is_call
+    units = structs.qty * lot_size
+    return pd.DataFrame({
+        "Delta": (units * bs_delta(spot, k, t, iv, call)).sum(axis=1),
+        "Gamma": (units * bs_gamma(spot, k, t, iv)).sum(axis=1),
+        "Theta/day": (units * bs_theta(spot, k, t, iv, call)).sum(axis=1),
+        "Vega/1%": (units * bs_vega(spot, k, t, iv) / 100).sum(axis=1),
+    })
+
+
+# ---------------------------------------------------------
+# CANDIDATES & RANKING
+# ---------------------------------------------------------
+def candidates(snap, walls):
+    """
+    Straddles/flies at ATM, debit spreads from ATM toward the walls, and
+    credit spreads, strangles and condors with short strikes at the walls.
+    """
+    n = len(snap)
+    res, sup = walls
+    atm = snap.atm_idx
+    cw = int(np.abs(snap.strikes - res).argmin()) if res else atm
+    pw = int(np.abs(snap.strikes - sup).argmin()) if sup else atm
+    k = lambda i: float(snap.strikes[i])
+    ok = lambda *idx: all(0 <= i < n for i in idx)
+
+    specs = []
+    for o in OFFSETS:
+        a = atm + o
+        if ok(a):
+            specs.append(("Long Straddle", [(k(a), True, 1), (k(a), False, 1)]))
+            specs.append(("Short Straddle", [(k(a), True, -1), (k(a), False, -1)]))
+        if ok(a, cw) and cw > a:
+            specs.append(("Bull Call Spread", [(k(a), True, 1), (k(cw), True, -1)]))
+        if ok(a, pw) and pw < a:
+            specs.append(("Bear Put Spread", [(k(a), False, 1), (k(pw), False, -1)]))
+        for w in WIDTHS:
+            if ok(a - w, a + w):
+                specs.append(("Iron Fly", [(k(a), True, -1), (k(a), False, -1),
+                                           (k(a + w), True, 1), (k(a - w), False, 1)]))
+            if ok(cw + o, cw + o + w):
+                specs.append(("Bear Call Spread", [(k(cw + o), True, -1), (k(cw + o + w), True, 1)]))
+            if ok(pw + o, pw + o - w):
+                specs.append(("Bull Put Spread", [(k(pw + o), False, -1), (k(pw + o - w), False, 1)]))
+        for p in OFFSETS:
+            c, q = cw + o, pw - p
+            if not ok(c, q) or c <= q:
+                continue
+            specs.append(("Short Strangle", [(k(c), True, -1), (k(q), False, -1)]))
+            for w in WIDTHS:
+                if ok(c + w, q - w):
+                    specs.append(("Iron Condor", [(k(c), True, -1), (k(c + w), True, 1),
+                                                  (k(q), False, -1), (k(q - w), False, 1)]))
+    return Structures.from_legs(specs)
+
+
+def atm_iv(snap, fallback=DEFAULT_IV):
+    i = snap.atm_idx
+    ivs = [v for v in (snap.ce_iv[i], snap.pe_iv[i]) if v > 0]
+    return float(np.mean(ivs)) / 100 if ivs else fallback
+
+
+def tail_loss(pnl, weights, tail=TAIL):
+    """
+    CVaR per row: the expected loss over the worst `tail` probability mass
+    of a (S, grid) P&L under grid `weights` (positive = loss).
+    """
+    order = np.argsort(pnl, axis=1)
+    worst = np.take_along_axis(pnl, order, axis=1)
+    w = weights[order]
+    before = np.cumsum(w, axis=1) - w
+    in_tail = np.clip(tail - before, 0, w)
+    return -(worst * in_tail).sum(axis=1) / tail
+
+
+def rank(structs, snap, t, lot_size=LOT_SIZE, top=20):
+    """
+    Prices every candidate and ranks by expected P&L per unit of tail risk
+    (E[P&L] / CVaR 5%, floored at MIN_RISK x gross premium) on a risk-neutral
+    lognormal grid at ATM IV, so a structure scores well only when its legs
+    are cheap (or rich, if sold) against that distribution. Max profit is read
+    off the grid (±GRID_SIGMAS), not taken as unlimited. Structures with a
+    short call not covered by a long call have unlimited upside risk and rank
+    last. Returns (table, the top-ranked Structures in table order).
+    """
+    sigma = atm_iv(snap)
+    listed = structs.price(snap, sigma)
+    structs = structs.take(np.flatnonzero(listed))
+    if not len(structs):
+        return pd.DataFrame(), structs
+
+    # Centre the grid on the forward's median so E[spot at expiry] is the forward
+    median = snap.ltp * np.exp((RISK_FREE - 0.5 * sigma * sigma) * t)
+    grid, z = spot_grid(median, t, sigma)
+    weights = np.exp(-0.5 * z * z)
+    weights /= weights.sum()
+    pnl = payoff_at_expiry(structs, grid, lot_size)
+
+    # Expiry payoff is piecewise linear: inside the grid its extremes sit at a
+    # strike or at the grid ends; loss is also checked at 0 and far upside
+    kinks = structs.strike[structs.qty != 0]
+    inside = np.unique(kinks[(kinks >= grid[0]) & (kinks <= grid[-1])])
+    ends = payoff_at_expiry(structs, np.concatenate([inside, [0.0, 2 * structs.strike.max()]]), lot_size)
+    calls = np.where(structs.is_call, structs.qty, 0).sum(axis=1)
+    unbounded = calls < 0
+    max_profit = np.maximum(pnl.max(axis=1), ends[:, :len(inside)].max(axis=1, initial=-np.inf))
+    max_loss = np.minimum(pnl.min(axis=1), ends.min(axis=1))
+    pop = (pnl > 0).astype(float) @ weights
+    expected = pnl @ weights
+    cvar = tail_loss(pnl, weights)
+    reward_risk = np.where(max_loss < 0, max_profit / np.maximum(-max_loss, 1e-9), np.inf)
+    gross = (np.abs(structs.qty) * structs.premium).sum(axis=1) * lot_size
+    risk = np.maximum(cvar, np.maximum(MIN_RISK * gross, 1.0))
+    score = np.where(unbounded, -np.inf, expected / risk)
+
+    order = np.argsort(-score, kind="stable")[:top]
+    best = structs.take(order)
+    table = pd.DataFrame({
+        "Structure": best.names,
+        "Legs": best.describe(),
+        "Net Premium": (best.net_premium * lot_size).round(0),
+        "Max Profit": max_profit[order].round(0),
+        "Max Loss": max_loss[order].round(0),
+        "Unlimited Risk": unbounded[order],
+        "POP": pop[order].round(3),
+        "Reward/Risk": reward_risk[order].round(2),
+        "E[P&L]": expected[order].round(0),
+        "CVaR 5%": cvar[order].round(0),
+        "Score": score[order].round(4),
+    })
+    table = pd.concat([table, greeks(best, snap.ltp, t, lot_size).round(2)], axis=1)
+    return table, best
+
+
+def payoff_frame(structs, i, spot, t, lot_size=LOT_SIZE):
+    """Expiry and T+0 payoff curves of structure `i`, for charting."""
+    one = structs.take([i])
+    grid, _ = spot_grid(spot, t, float(np.nanmean(one.iv[one.qty != 0])))
+    return pd.DataFrame({
+        "Spot": grid.round(1),
+        "Expiry": payoff_at_expiry(one, grid, lot_size)[0],
+        "T+0": payoff_now(one, grid, t, lot_size)[0],
+    })
@@ -0,0 +1,135 @@
+"""
+On-demand sampling profiler for refresh cycles.
+
+Arm it with NOM_PROFILE_CYCLES=N (or `request(N)` from a sidebar toggle) and
+the next N `with profiler.cycle("analyze_market"):` blocks are sampled from a
+background thread via `sys._current_frames()`. Nothing is traced, so the
+profiled code runs at full speed; when idle the hook is a flag check.
+
+Output per capture, written to NOM_PROFILE_DIR (default ./profiles):
+  <name>-<stamp>.collapsed  -- "frame;frame;frame count" lines (flamegraph.pl / speedscope)
+  <name>-<stamp>.top.txt    -- top functions by self and cumulative samples
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get("NOM_PROFILE_DIR", "profiles")
+INTERVAL = float(os.environ.get("NOM_PROFILE_INTERVAL", "0.005"))  # Seconds between samples
+MAX_DEPTH = 64
+
+_lock = threading.Lock()
+_remaining = int(os.environ.get("NOM_PROFILE_CYCLES", "0"))
+_stacks = Counter()
+_cycles_done = 0
+_last_output = None
+
+
+def request(cycles):
+    """Arms the profiler for the next `cycles` refresh cycles."""
+    global _remaining, _cycles_done
+    with _lock:
+        _remaining = int(cycles)
+        _cycles_done = 0
+        _stacks.clear()
+
+
+def pending():
+    return _remaining
+
+
+def last_output():
+    """Paths of the most recent capture, or None."""
+    return _last_output
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _sample(thread_id, stop, stacks):
+    while not stop.wait(INTERVAL):
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            continue
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        stacks[";".join(reversed(stack))] += 1
+
+
+@contextmanager
+def cycle(name):
+    """Samples the calling thread for the duration of the block if armed."""
+    global _remaining, _cycles_done
+    if _remaining <= 0:
+        yield
+        return
+
+    stacks = Counter()
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sample, args=(threading.get_ident(), stop, stacks), daemon=True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        sampler.join()
+        with _lock:
+            _stacks.update(stacks)
+            _remaining -= 1
+            _cycles_done += 1
+            if _remaining <= 0:
+                _write(name)
+
+
+def _top_table(stacks, limit=30):
+    self_counts = Counter()
+    cum_counts = Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += n
+        for fn in set(frames):
+            cum_counts[fn] += n
+
+    total = sum(stacks.values()) or 1
+    lines = [f"{'self%':>7} {'cum%':>7} {'self':>7} {'cum':>7}  function"]
+    for fn, cum in cum_counts.most_common(limit):
+        s = self_counts[fn]
+        lines.append(f"{100 * s / total:7.2f} {100 * cum / total:7.2f} {s:7d} {cum:7d}  {fn}")
+    return "\n".join(lines)
+
+
+def _write(name):
+    global _last_output
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(PROFILE_DIR, f"{name}-{stamp}")
+
+    with open(base + ".collapsed", "w") as f:
+        for stack, n in _stacks.most_common():
+            f.write(f"{stack} {n}\n")
+
+    with open(base + ".top.txt", "w") as f:
+        f.write(f"# {name}: {_cycles_done} cycles, {sum(_stacks.values())} samples @ {INTERVAL * 1000:.1f}ms\n")
+        f.write(_top_table(_stacks) + "\n")
+
+    _last_output = (base + ".collapsed", base + ".top.txt")
+    _stacks.clear()
+
+
+def render_sidebar(st):
+    """Sidebar toggle to capture the next N cycles."""
+    with st.sidebar.expander("🔬 Profiler", expanded=False):
+        n = st.number_input("Cycles to capture", min_value=1, max_value=50, value=3, step=1)
+        if st.button("Capture profile"):
+            request(n)
+        if pending() > 0:
+            st.caption(f"Capturing... {pending()} cycle(s) left")
+        elif last_output():
+            st.caption(f"Last capture: {last_output()[0]}")
@@ -0,0 +1,260 @@
+"""
+Resilient upstream fetches.
+
+`ResilientFetcher` wraps a Dhan call with:
+  - a per-refresh deadline budget,
+  - a hedged duplicate request fired after the endpoint's recent p95 latency
+    (never sooner than its rate limiter's spacing),
+  - a cap on in-flight calls, so stragglers that hang cannot fill the pool,
+  - a circuit breaker that stops calling an endpoint that keeps failing,
+  - a last-good response per argument set (which includes the security id),
+    served (marked stale) when the live call cannot complete in time.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, size=50, default=1.0):
+        self._samples = deque(maxlen=size)
+        self.default = default
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def quantile(self, q):
+        if len(self._samples) < 5:
+            return self.default
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; after `cooldown`
+    seconds one trial call is let through (half-open) and its outcome decides.
+    """
+
+    def __init__(self, threshold=3, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None: return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown: return "half-open"
+        return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Spaces calls to one endpoint across every thread in the process: each
+    caller reserves the next free slot, `spacing` seconds after the last.
+    """
+
+    def __init__(self, spacing):
+        self.spacing = spacing
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, until=None):
+        """
+        Sleeps until this caller's slot. Returns False without taking a slot
+        if the next one falls after `until` (a time.monotonic() deadline).
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            if until is not None and slot > until:
+                return False
+            self._next = slot + self.spacing
+        time.sleep(slot - now)
+        return True
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, spacing):
+    """Process-wide limiter per endpoint, shared by live polls and background builders."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(spacing)
+        return _limiters[name]
+
+
+class NoSlot(TimeoutError):
+    """The rate limiter had no free slot before the fetch deadline."""
+
+
+def is_success(resp):
+    return isinstance(resp, dict) and resp.get('status') == 'success'
+
+
+class ResilientFetcher:
+    def __init__(self, name, fn, deadline=20.0, hedge_quantile=0.95, min_hedge_delay=0.3,
+                 breaker=None, ok=is_success, limiter=None, max_in_flight=4):
+        self.name = name
+        self.fn = fn
+        self.deadline = deadline
+        self.hedge_quantile = hedge_quantile
+        # A hedge inside the endpoint's spacing would only invite a throttle
+        self.min_hedge_delay = max(min_hedge_delay, limiter.spacing if limiter else 0)
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.ok = ok
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"fetch-{name}")
+        self._last_good = {}   # args key -> (resp, wall time)
+
+    def _timed(self, args, kwargs, end, started=None):
+        try:
+            if self.limiter is not None and not self.limiter.wait(until=end):
+                raise NoSlot(f"{self.name}: no upstream slot before the deadline")
+        finally:
+            if started is not None:
+                started.set()
+        start = time.perf_counter()
+        resp = self.fn(*args, **kwargs)
+        return resp, time.perf_counter() - start
+
+    def _submit(self, args, kwargs, end, started=None):
+        """
+        Starts one call, or returns None while `max_in_flight` calls (including
+        stragglers from earlier fetches) are still running, so hung requests
+        cannot pile up.
+        """
+        with self._in_flight_lock:
+            if self._in_flight >= self.max_in_flight:
+                metrics.inc("nom_in_flight_capped_total", endpoint=self.name)
+                return None
+            self._in_flight += 1
+        fut = self._pool.submit(self._timed, args, kwargs, end, started)
+        fut.add_done_callback(self._done)
+        return fut
+
+    def _done(self, _):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def fetch(self, *args, deadline=None, **kwargs):
+        """
+        Returns {"data", "stale", "age", "source"}; "data" is None only when
+        the live call failed and nothing good was ever fetched for these args.
+        """
+        key = repr((args, sorted(kwargs.items())))
+        budget = self.deadline if deadline is None else deadline
+        end = time.monotonic() + budget
+
+        if self.breaker.allow():
+            resp, source = self._race(args, kwargs, end)
+            if resp is not None:
+                self._last_good[key] = (resp, time.time())
+                return {"data": resp, "stale": False, "age": 0.0, "source": source}
+        else:
+            metrics.inc("nom_breaker_short_circuit_total", endpoint=self.name)
+
+        if key in self._last_good:
+            resp, at = self._last_good[key]
+            metrics.inc("nom_stale_served_total", endpoint=self.name)
+            return {"data": resp, "stale": True, "age": time.time() - at, "source": "cache"}
+        return {"data": None, "stale": True, "age": None, "source": "none"}
+
+    def _race(self, args, kwargs, end):
+        hedge_delay = max(self.latency.quantile(self.hedge_quantile), self.min_hedge_delay)
+        started = threading.Event()
+        primary = self._submit(args, kwargs, end, started)
+        if primary is None:
+            return None, None
+        pending = {primary: "primary"}
+        hedged = False
+
+        # The hedge clock starts once the primary holds its rate-limit slot:
+        # time queued behind other callers is not upstream slowness
+        started.wait(max(end - time.monotonic(), 0))
+        hedge_at = time.monotonic() + hedge_delay
+
+        while pending:
+            now = time.monotonic()
+            remaining = end - now
+            if remaining <= 0:
+                break
+            timeout = remaining if hedged else min(remaining, max(hedge_at - now, 0))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for fut in done:
+                source = pending.pop(fut)
+                try:
+                    resp, took = fut.result()
+                except NoSlot:
+                    hedged = True           # A hedge would find no slot either
+                    continue
+                except Exception:
+                    self.breaker.failure()
+                    continue
+                if self.ok(resp):
+                    self.latency.add(took)
+                    self.breaker.success()
+                    return resp, source
+                self.breaker.failure()
+
+            # Hedge once: after the p95 delay, or right away if the primary failed fast
+            if not hedged and self.breaker.allow() and time.monotonic() < end:
+                hedged = True
+                hedge = self._submit(args, kwargs, end)
+                if hedge is not None:
+                    metrics.inc("nom_hedged_requests_total", endpoint=self.name)
+                    pending[hedge] = "hedge"
+
+        # Stragglers finish on the pool (results dropped) and count against max_in_flight
+        if pending:
+            self.breaker.failure()
+            metrics.inc("nom_deadline_exceeded_total", endpoint=self.name)
+        return None, None
+
+
+_fetchers = {}
+_fetchers_lock = threading.Lock()
+
+
+def get_fetcher(name, fn, **kwargs):
+    """Process-wide fetcher per endpoint so latency stats and breakers persist across reruns."""
+    with _fetchers_lock:
+        if name not in _fetchers:
+            _fetchers[name] = ResilientFetcher(name, fn, **kwargs)
+        fetcher = _fetchers[name]
+        fetcher.fn = fn
+        return fetcher
+
+
+def stale_banner(st, result, what="option chain"):
+    """Warning shown whenever a refresh is rendering cached data."""
+    if result and result.get("stale") and result.get("age") is not None:
+        st.warning(f"⚠️ Showing last good {what} from {result['age']:.0f}s ago (live fetch failed or timed out).")
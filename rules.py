@@ -0,0 +1,235 @@
+"""
+Declarative signal rules compiled to vectorised NumPy masks.
+
+A rule file is an ordered list; the first rule whose condition holds names
+the signal, otherwise the default applies:
+
+    # label | color : condition
+    SCALP BUY 🚀 | green : ltp > ema and rsi > 55 and buildup in (LONG_BUILDUP, LONG_UNWINDING)
+    default : WAIT | gray
+
+Conditions support and/or/not, comparisons (chained too), + - * /, abs(),
+`x in (A, B)`, between(x, lo, hi), crosses_above(a, b) and crosses_below(a, b).
+Names resolve to feature arrays or to the constants below. Each condition is
+compiled once into a closure over whole arrays, so one live tick and a
+million replayed ticks go through the same code with no per-row branching.
+"""
+import ast
+import operator
+
+import numpy as np
+
+# Categorical feature codes (see strategies.classify_buildup)
+CONSTANTS = {
+    "NEUTRAL": 0,
+    "LONG_BUILDUP": 1,
+    "SHORT_COVERING": 2,
+    "SHORT_BUILDUP": 3,
+    "LONG_UNWINDING": 4,
+}
+
+_COMPARE = {
+    ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+_BINOP = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _prev(a):
+    """Value one row earlier; the first row has no history (NaN)."""
+    a = np.asarray(a, dtype=float)
+    out = np.empty_like(a)
+    out[:1] = np.nan
+    out[1:] = a[:-1]
+    return out
+
+
+def _crosses_above(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    return (a > b) & (_prev(a) <= _prev(b))
+
+
+def _crosses_below(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    return (a < b) & (_prev(a) >= _prev(b))
+
+
+def _between(x, lo, hi):
+    return (x >= lo) & (x <= hi)
+
+
+_FUNCS = {
+    "crosses_above": _crosses_above,
+    "crosses_below": _crosses_below,
+    "between": _between,
+    "abs": np.abs,
+}
+
+
+def _compile(node):
+    """Turns an AST node into fn(features) -> array."""
+    if isinstance(node, ast.Expression):
+        return _compile(node.body)
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        def boolop(f):
+            out = parts[0](f)
+            for p in parts[1:]:
+                out = combine(out, p(f))
+            return out
+        return boolop
+
+    if isinstance(node, ast.UnaryOp):
+        inner = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda f: np.logical_not(inner(f))
+        if isinstance(node.op, ast.USub):
+            return lambda f: np.negative(inner(f))
+        raise RuleError(f"Unsupported unary operator: {ast.dump(node.op)}")
+
+    if isinstance(node, ast.Compare):
+        left = _compile(node.left)
+        steps = []
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(right, (ast.Tuple, ast.List, ast.Set)):
+                    raise RuleError("'in' needs a literal tuple, e.g. x in (A, B)")
+                members = [_compile(e) for e in right.elts]
+                negate = isinstance(op, ast.NotIn)
+                steps.append((None, members, negate))
+            elif type(op) in _COMPARE:
+                steps.append((_COMPARE[type(op)], _compile(right), False))
+            else:
+                raise RuleError(f"Unsupported comparison: {ast.dump(op)}")
+
+        def compare(f):
+            lhs = left(f)
+            out = None
+            for fn, rhs, negate in steps:
+                if fn is None:
+                    res = np.isin(lhs, [m(f) for m in rhs])
+                    res = ~res if negate else res
+                    nxt = lhs
+                else:
+                    nxt = rhs(f)
+                    res = fn(lhs, nxt)
+                out = res if out is None else out & res
+                lhs = nxt
+            return out
+        return compare
+
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in _BINOP:
+            raise RuleError(f"Unsupported operator: {ast.dump(node.op)}")
+        fn = _BINOP[type(node.op)]
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda f: fn(left(f), right(f))
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCS or node.keywords:
+            raise RuleError(f"Unknown function: {ast.unparse(node.func)}")
+        fn = _FUNCS[node.func.id]
+        args = [_compile(a) for a in node.args]
+        return lambda f: fn(*(a(f) for a in args))
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda f: value
+        def lookup(f):
+            try:
+                return f[name]
+            except KeyError:
+                raise RuleError(f"Unknown feature: {name}") from None
+        return lookup
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        value = node.value
+        return lambda f: value
+
+    raise RuleError(f"Unsupported syntax: {ast.unparse(node)}")
+
+
+def compile_expr(text):
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Cannot parse rule '{text.strip()}': {e.msg}") from None
+    return _compile(tree)
+
+
+class Rule:
+    def __init__(self, label, color, condition):
+        self.label = label
+        self.color = color
+        self.condition = condition
+        self.mask = compile_expr(condition)
+
+
+class RuleSet:
+    def __init__(self, rules, default=("WAIT", "gray")):
+        self.rules = rules
+        self.default = default
+        self.labels = [r.label for r in rules] + [default[0]]
+        self.colors = [r.color for r in rules] + [default[1]]
+
+    @classmethod
+    def parse(cls, text):
+        rules = []
+        default = ("WAIT", "gray")
+        for lineno, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            head, sep, expr = line.partition(" : ")
+            if not sep:
+                raise RuleError(f"Line {lineno}: expected 'label | color : condition'")
+            if head.strip() == "default":
+                head, expr = expr, None
+            label, _, color = head.partition("|")
+            label, color = label.strip(), (color.strip() or "gray")
+            if expr is None:
+                default = (label, color)
+            else:
+                try:
+                    rules.append(Rule(label, color, expr))
+                except RuleError as e:
+                    raise RuleError(f"Line {lineno}: {e}") from None
+        return cls(rules, default)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.parse(f.read())
+
+    def select(self, features):
+        """
+        Index of the first matching rule per row (len(rules) = default).
+        `features` maps names to equal-length arrays.
+        """
+        n = len(next(iter(features.values())))
+        out = np.full(n, len(self.rules), dtype=np.int16)
+        undecided = np.ones(n, dtype=bool)
+        for i, rule in enumerate(self.rules):
+            hit = np.broadcast_to(np.asarray(rule.mask(features), dtype=bool), (n,)) & undecided
+            out[hit] = i
+            undecided &= ~hit
+            if not undecided.any():
+                break
+        return out
+
+    def evaluate(self, features):
+        """(label, color) for the last row -- the live tick."""
+        idx = int(self.select(features)[-1])
+        return self.labels[idx], self.colors[idx]
+
+    def label_array(self, features):
+        return np.asarray(self.labels, dtype=object)[self.select(features)]
@@ -0,0 +1,210 @@
+"""
+Market-session-aware poll scheduling.
+
+Nothing is fetched outside the NSE session (weekends, holidays, nights).
+During the session the poll interval adapts: it shrinks when realized
+volatility is high or spot is close to a gamma wall, during the opening
+minutes and on expiry afternoons, and it never drops below the upstream
+rate limit. Polls are pulled forward to land just after each bar closes, so
+every bar gets a fresh chain.
+
+Set NOM_ALWAYS_OPEN=1 to treat every moment as the open session (dev, load tests).
+"""
+import logging
+import math
+import os
+from datetime import date, datetime, time as dtime, timedelta
+
+import pandas as pd
+
+from bars import IST, SESSION_OPEN, bar_start, to_ist
+
+PRE_OPEN = dtime(9, 0)          # Pre-open order entry starts
+SESSION_CLOSE = dtime(15, 30)
+OPENING_MINUTES = 15            # Treated as hot after the open
+EXPIRY_HOT_FROM = dtime(14, 0)  # Expiry-day afternoon is hot too
+
+UPSTREAM_SPACING = 3.0          # Dhan: one option-chain call per 3s
+SETTLE = 2.0                    # Poll this long after a bar closes
+CLOSED_RECHECK = 300            # Max idle sleep while closed (no upstream calls)
+
+HOLIDAYS_FILE = os.environ.get("NOM_HOLIDAYS", os.path.join(os.path.dirname(__file__), "holidays.txt"))
+ALWAYS_OPEN = os.environ.get("NOM_ALWAYS_OPEN") == "1"
+
+CLOSED, PRE, OPEN = "closed", "pre-open", "open"
+
+log = logging.getLogger(__name__)
+
+
+def load_holidays(path=HOLIDAYS_FILE):
+    """Trading holidays from a file of YYYY-MM-DD lines (# comments allowed)."""
+    days = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    days.add(date.fromisoformat(line))
+    except OSError:
+        pass
+    return frozenset(days)
+
+
+HOLIDAYS = load_holidays()
+_warned_years = set()
+
+
+def check_calendar(day, holidays=HOLIDAYS):
+    """Warns once per year when the holiday calendar has no entries for `day`'s year."""
+    if day.year in _warned_years or any(h.year == day.year for h in holidays):
+        return
+    _warned_years.add(day.year)
+    log.warning("No NSE holidays listed for %d in %s; every weekday counts as a trading day. "
+                "Add the exchange circular's dates.", day.year, HOLIDAYS_FILE)
+
+
+def is_trading_day(day, holidays=HOLIDAYS):
+    check_calendar(day, holidays)
+    return day.weekday() < 5 and day not in holidays
+
+
+def session_phase(now=None, holidays=HOLIDAYS):
+    """CLOSED, PRE (09:00-09:15) or OPEN (09:15-15:30) for an IST moment."""
+    if ALWAYS_OPEN:
+        return OPEN
+    now = to_ist(now or datetime.now(IST))
+    if not is_trading_day(now.date(), holidays):
+        return CLOSED
+    t = now.time()
+    if SESSION_OPEN <= t < SESSION_CLOSE:
+        return OPEN
+    if PRE_OPEN <= t < SESSION_OPEN:
+        return PRE
+    return CLOSED
+
+
+def next_pre_open(now=None, holidays=HOLIDAYS):
+    """Start of the next pre-open session strictly after `now`."""
+    now = to_ist(now or datetime.now(IST))
+    day = now.date()
+    if now.time() >= PRE_OPEN:
+        day += timedelta(days=1)
+    while not is_trading_day(day, holidays):
+        day += timedelta(days=1)
+    return IST.localize(datetime.combine(day, PRE_OPEN))
+
+
+class Scheduler:
+    """
+    Decides how long to wait before the next poll.
+
+    observe() is fed every fresh snapshot (spot and the call/put walls);
+    plan() returns {"phase", "delay", "reason", "next_open"}. The interval is
+    chosen so that a typical move between polls stays within `move_points`
+    and within `wall_fraction` of the distance to the nearest wall.
+    """
+
+    def __init__(self, min_interval=5, max_interval=180, base_interval=60, hot_interval=10,
+                 pre_open_interval=60, bar_minutes=1, calls_per_poll=1, move_points=8.0,
+                 wall_fraction=0.25, halflife=20, holidays=HOLIDAYS):
+        self.floor = max(min_interval, calls_per_poll * UPSTREAM_SPACING)
+        self.max_interval = max_interval
+        self.base_interval = base_interval
+        self.hot_interval = hot_interval
+        self.pre_open_interval = pre_open_interval
+        self.bar_minutes = bar_minutes
+        self.move_points = move_points
+        self.wall_fraction = wall_fraction
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.holidays = holidays
+
+        self.expiry = None
+        self.spot = None
+        self.walls = ()
+        self._last_ts = None
+        self._var_rate = None         # EWMA of squared log return per second
+
+    def set_expiry(self, expiry):
+        self.expiry = pd.Timestamp(expiry).date() if expiry else None
+
+    def observe(self, ts, spot, walls=()):
+        """Folds one fresh snapshot into the volatility estimate."""
+        ts = to_ist(ts).timestamp()
+        if spot and self.spot and self._last_ts is not None and ts > self._last_ts:
+            rate = math.log(spot / self.spot) ** 2 / (ts - self._last_ts)
+            self._var_rate = rate if self._var_rate is None else self._var_rate + self.alpha * (rate - self._var_rate)
+        if spot:
+            self.spot, self._last_ts = spot, ts
+        self.walls = tuple(w for w in walls if w)
+
+    @property
+    def points_per_sqrt_second(self):
+        """Realized one-sigma move in index points over one second (None until known)."""
+        if not self._var_rate or not self.spot:
+            return None
+        return self.spot * math.sqrt(self._var_rate)
+
+    def interval(self, now=None):
+        """Adaptive in-session interval (before bar alignment) and why."""
+        now = to_ist(now or datetime.now(IST))
+        interval, reason = self.base_interval, "base"
+
+        sigma = self.points_per_sqrt_second
+        if sigma:
+            # Time for a one-sigma move of `move_points`: (points / sigma)^2
+            vol_interval = (self.move_points / sigma) ** 2
+            if vol_interval < interval:
+                interval, reason = vol_interval, f"volatility ({sigma * math.sqrt(60):.1f} pts/min)"
+            if self.walls:
+                distance = min(abs(self.spot - w) for w in self.walls)
+                wall_interval = (self.wall_fraction * distance / sigma) ** 2
+                if wall_interval < interval:
+                    interval, reason = wall_interval, f"wall {distance:.0f} pts away"
+
+        opened = now.replace(hour=SESSION_OPEN.hour, minute=SESSION_OPEN.minute, second=0, microsecond=0)
+        if now < opened + timedelta(minutes=OPENING_MINUTES) and self.hot_interval < interval:
+            interval, reason = self.hot_interval, "opening minutes"
+        if self.expiry == now.date() and now.time() >= EXPIRY_HOT_FROM and self.hot_interval < interval:
+            interval, reason = self.hot_interval, "expiry afternoon"
+
+        if interval < self.floor:
+            interval, reason = self.floor, reason + ", rate-limited"
+        return min(interval, self.max_interval), reason
+
+    def plan(self, now=None):
+        now = to_ist(now or datetime.now(IST))
+        phase = session_phase(now, self.holidays)
+        plan = {"phase": phase, "next_open": None}
+
+        if phase == CLOSED:
+            plan["next_open"] = next_pre_open(now, self.holidays)
+            to_open = (plan["next_open"] - now).total_seconds()
+            plan.update(delay=min(to_open, CLOSED_RECHECK), reason="market closed")
+            return plan
+
+        if phase == PRE:
+            # Slow polls, but land the first in-session one right after 09:15
+            opened = now.replace(hour=SESSION_OPEN.hour, minute=SESSION_OPEN.minute, second=0, microsecond=0)
+            to_open = (opened - now).total_seconds() + SETTLE
+            plan.update(delay=min(self.pre_open_interval, to_open), reason="pre-open")
+            return plan
+
+        delay, reason = self.interval(now)
+        bar_close = bar_start(now, self.bar_minutes) + timedelta(minutes=self.bar_minutes)
+        to_bar = (bar_close - now).total_seconds() + SETTLE
+        if to_bar < delay:
+            delay, reason = max(to_bar, self.floor), reason + f", aligned to {self.bar_minutes}m bar"
+
+        closing = now.replace(hour=SESSION_CLOSE.hour, minute=SESSION_CLOSE.minute, second=0, microsecond=0)
+        to_close = (closing - now).total_seconds() + SETTLE
+        if not ALWAYS_OPEN and to_close < delay:
+            delay, reason = max(to_close, self.floor), "final poll at the close"
+        plan.update(delay=delay, reason=reason)
+        return plan
+
+
+def describe(plan):
+    """One-line status for the dashboards."""
+    if plan["phase"] == CLOSED:
+        return f"💤 Market closed. Next session {plan['next_open']:%a %d %b %H:%M} IST; no polling until then."
+    return f"Next refresh in {plan['delay']:.0f}s ({plan['reason']})"
@@ -0,0 +1,333 @@
+"""
+Shared-memory snapshot bus.
+
+One publisher process polls the option chain and writes each columnar
+snapshot into a ring of fixed-size slots in `multiprocessing.shared_memory`.
+Any number of dashboard / analytics processes attach to the same segment
+and read snapshots as NumPy views straight onto it: adding workers adds no
+upstream calls and no per-process copies of the chain.
+
+    python snapbus.py --name nifty                  # publisher
+    NOM_SNAPBUS=nifty streamlit run app_good.py     # readers
+
+Each slot carries a seqlock: the writer makes it odd, fills the slot, then
+makes it even again. A reader that sees the same even value before and after
+copying a slot has a consistent snapshot. Reads copy by default; with
+`copy=False` the columns are views that the writer reuses once the ring
+wraps (`slots` publishes later), so the caller must check `is_current()`
+after it is done with them.
+"""
+import argparse
+import logging
+import os
+import struct
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from chain import LEG_FIELDS, ChainSnapshot
+
+BUS_NAME = os.environ.get("NOM_SNAPBUS")
+STALE_AFTER = 240               # Seconds without a publish before readers call it stale
+REATTACH_EVERY = 5              # Seconds between re-attach attempts while the bus is stale
+
+MAGIC = 0x4E4F4D42              # "NOMB"
+COLUMNS = [f"{side}_{suffix}" for side in ("ce", "pe") for suffix in LEG_FIELDS]
+
+# Bus header: magic, slots, capacity, latest seq (-1 = none yet), live flag
+_HEADER = struct.Struct("<qqqqq")
+# Slot header: seqlock, seq, strike count, security id, timestamp, ltp, expiry
+_SLOT = struct.Struct("<qqqqdd16s")
+_ALIGN = 64
+
+log = logging.getLogger(__name__)
+
+
+def _round_up(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _open(name):
+    """Attaches without letting this process's resource tracker unlink the segment on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)    # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SnapshotBus:
+    def __init__(self, shm, owner=False):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        _, self.slots, self.capacity, _, _ = _HEADER.unpack_from(shm.buf, 0)
+        self._head = np.ndarray(5, dtype=np.int64, buffer=shm.buf)
+        self._data_offset = _round_up(_SLOT.size)
+        self._slot_bytes = _round_up(self._data_offset + 8 * (1 + len(COLUMNS)) * self.capacity)
+
+    @classmethod
+    def create(cls, name, slots=8, capacity=512):
+        """Publisher side: creates (or replaces) the named segment."""
+        size = _round_up(_HEADER.size) + slots * _round_up(
+            _round_up(_SLOT.size) + 8 * (1 + len(COLUMNS)) * capacity)
+        try:
+            shared_memory.SharedMemory(name=name).unlink()   # Left over from a crashed publisher
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, MAGIC, slots, capacity, -1, 1)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Reader side; raises FileNotFoundError if no publisher has created `name`."""
+        shm = _open(name)
+        if _HEADER.unpack_from(shm.buf, 0)[0] != MAGIC:
+            shm.close()
+            raise ValueError(f"{name} is not a snapshot bus")
+        return cls(shm)
+
+    # ---------------------------------------------------------
+    # LAYOUT
+    # ---------------------------------------------------------
+    @property
+    def latest_seq(self):
+        return int(self._head[3])
+
+    @property
+    def live(self):
+        return bool(self._head[4])
+
+    @property
+    def latest_timestamp(self):
+        """Publish time of the latest slot, or None before the first publish."""
+        seq = self.latest_seq
+        if seq < 0:
+            return None
+        return _SLOT.unpack_from(self._shm.buf, self._slot_offset(seq))[4]
+
+    def age(self):
+        ts = self.latest_timestamp
+        return None if ts is None else time.time() - ts
+
+    def _slot_offset(self, seq):
+        return _round_up(_HEADER.size) + (seq % self.slots) * self._slot_bytes
+
+    def _lock(self, seq):
+        return np.ndarray(1, dtype=np.int64, buffer=self._shm.buf, offset=self._slot_offset(seq))
+
+    def _block(self, seq):
+        """(1 + columns) x capacity float64 view: strikes, then one row per leg field."""
+        return np.ndarray((1 + len(COLUMNS), self.capacity), dtype=np.float64, buffer=self._shm.buf,
+                          offset=self._slot_offset(seq) + self._data_offset)
+
+    # ---------------------------------------------------------
+    # PUBLISH / READ
+    # ---------------------------------------------------------
+    def publish(self, snap, security_id=0, timestamp=None):
+        """Writes one ChainSnapshot into the next slot; returns its sequence number."""
+        n = len(snap)
+        if n > self.capacity:
+            raise ValueError(f"{n} strikes exceed bus capacity {self.capacity}")
+        seq = self.latest_seq + 1
+        off = self._slot_offset(seq)
+        lock = self._lock(seq)
+
+        lock[0] += 1                                    # Odd: write in progress
+        block = self._block(seq)
+        block[0, :n] = snap.strikes
+        for row, name in enumerate(COLUMNS, start=1):
+            block[row, :n] = snap.columns[name]
+        ts = time.time() if timestamp is None else timestamp
+        expiry = str(snap.expiry or "").encode()[:16]
+        _SLOT.pack_into(self._shm.buf, off, int(lock[0]), seq, n, int(security_id), ts, snap.ltp, expiry)
+        lock[0] += 1                                    # Even: slot consistent
+        self._head[3] = seq
+        return seq
+
+    def _snapshot(self, seq, block, n, ltp, expiry, ts):
+        columns = {name: block[row, :n] for row, name in enumerate(COLUMNS, start=1)}
+        strikes = block[0, :n]
+        snap = ChainSnapshot(strikes, [f"{k:.6f}" for k in strikes], columns, ltp, expiry, ts)
+        snap.bus_seq = seq
+        return snap
+
+    def read(self, seq=None, copy=True, security_id=None, expiry=None):
+        """
+        Snapshot `seq` (default: latest) or None if there is none, it has been
+        overwritten, or it does not match `security_id` / `expiry`. With
+        `copy=False` the columns are views onto shared memory and are only
+        consistent if `is_current()` still holds after they have been used.
+        """
+        seq = self.latest_seq if seq is None else seq
+        if seq < 0 or seq <= self.latest_seq - self.slots:
+            return None
+        off = self._slot_offset(seq)
+        for _ in range(100):
+            lock, slot_seq, n, sec_id, ts, ltp, raw_expiry = _SLOT.unpack_from(self._shm.buf, off)
+            if lock % 2:
+                time.sleep(0)                           # Writer mid-slot; retry
+                continue
+            if slot_seq != seq:
+                return None
+            block = self._block(seq)[:, :n]
+            if copy:
+                block = block.copy()
+            if self._lock(seq)[0] != lock:
+                continue
+            if security_id is not None and sec_id != int(security_id):
+                return None
+            slot_expiry = raw_expiry.rstrip(b"\0").decode() or None
+            if expiry is not None and slot_expiry != str(expiry):
+                return None
+            return self._snapshot(seq, block, n, ltp, slot_expiry, ts)
+        return None
+
+    def is_current(self, snap):
+        """True while a zero-copy snapshot's slot has not been reused."""
+        return _SLOT.unpack_from(self._shm.buf, self._slot_offset(snap.bus_seq))[1] == snap.bus_seq \
+            and self._lock(snap.bus_seq)[0] % 2 == 0
+
+    def close(self):
+        if self.owner:
+            self._head[4] = 0
+        # Drop our views before unmapping
+        self._head = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+# Per-process reader, shared by every session of a dashboard
+_reader = None
+_last_attach = 0.0
+
+
+def get_reader(name=BUS_NAME):
+    """
+    Attached reader for NOM_SNAPBUS, or None if unset, no publisher is
+    running, or the publisher has gone quiet for STALE_AFTER seconds (e.g.
+    it was killed without clearing its live flag). Callers then poll
+    upstream themselves.
+    """
+    global _reader, _last_attach
+    if not name:
+        return None
+    if _reader is not None and not _reader.live:
+        _reader = None                                  # Publisher shut down or restarted
+    stale = _reader is not None and (_reader.age() or 0) > STALE_AFTER
+    if _reader is None or stale:
+        now = time.monotonic()
+        if now - _last_attach >= REATTACH_EVERY:
+            _last_attach = now
+            # A restarted publisher recreates the segment under the same name.
+            # The old mapping is only dropped, not closed: other sessions may
+            # still be reading from it.
+            try:
+                _reader = SnapshotBus.attach(name)
+            except (FileNotFoundError, ValueError):
+                _reader = None
+        if _reader is None or (_reader.age() or 0) > STALE_AFTER:
+            return None
+    return _reader
+
+
+# ---------------------------------------------------------
+# PUBLISHER
+# ---------------------------------------------------------
+def _credentials():
+    client_id = os.environ.get("DHAN_CLIENT_ID")
+    token = os.environ.get("DHAN_ACCESS_TOKEN")
+    if client_id and token:
+        return client_id, token
+    import tomllib
+    with open(os.path.join(".streamlit", "secrets.toml"), "rb") as f:
+        dhan = tomllib.load(f)["dhan"]
+    return dhan["client_id"], dhan["access_token"]
+
+
+def publish_forever(name, security_id=13, segment="IDX_I", expiry=None, slots=8, capacity=512):
+    from dhanhq import dhanhq
+
+    import metrics
+    import resilient
+    import scheduler
+    from chain import parse_chain
+    from strategies import Features
+
+    dhan = dhanhq(*_credentials())
+    metrics.start_server()
+    bus = SnapshotBus.create(name, slots, capacity)
+    sched = scheduler.Scheduler()
+    limiter = resilient.get_limiter("option_chain", scheduler.UPSTREAM_SPACING)
+    chains = resilient.get_fetcher("option_chain", lambda *a: metrics.call("option_chain", dhan.option_chain, *a),
+                                   limiter=limiter)
+    expiries = resilient.get_fetcher("expiry_list", lambda *a: metrics.call("expiry_list", dhan.expiry_list, *a),
+                                     deadline=10)
+    print(f"Publishing {security_id}/{segment} to shared memory '{name}' ({slots} slots)")
+
+    exp, exp_day = expiry, None
+    try:
+        while True:
+            plan = sched.plan()
+            if plan["phase"] == scheduler.CLOSED:
+                time.sleep(plan["delay"])
+                continue
+
+            try:
+                # The nearest expiry only changes across days; look it up once per day
+                today = datetime.now(scheduler.IST).date()
+                if not expiry and exp_day != today:
+                    exp = _nearest_expiry(expiries, security_id, segment) or exp
+                    exp_day = today if exp else None
+                if not exp:
+                    time.sleep(sched.plan()["delay"])
+                    continue
+
+                sched.set_expiry(exp)
+                resp = chains.fetch(int(security_id), segment, exp)
+                if resp["data"] and not resp["stale"] and resp["data"].get("status") == "success":
+                    raw = resp["data"].get("data", {})
+                    final_data = raw.get("data", raw) if "data" in raw else raw
+                    oc, ltp = final_data.get("oc", {}), final_data.get("last_price", 0)
+                    if oc and ltp:
+                        snap = parse_chain(oc, ltp, expiry=exp)
+                        bus.publish(snap, security_id)
+                        metrics.mark_snapshot()
+                        sched.observe(time.time(), snap.ltp, Features(snap).walls)
+            except Exception:
+                log.exception("Publish cycle failed; retrying next poll")
+            time.sleep(sched.plan()["delay"])
+    finally:
+        bus.close()
+
+
+def _nearest_expiry(fetcher, security_id, segment):
+    """Nearest listed expiry (YYYY-MM-DD) via the resilient fetcher, or None."""
+    resp = fetcher.fetch(int(security_id), segment)["data"]
+    if not resp:
+        return None
+    data = resp.get("data", {})
+    dates = data.get("data", []) if isinstance(data, dict) else data
+    dates = sorted(d for d in dates or [] if str(d).count("-") == 2)
+    return dates[0] if dates else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publishes option-chain snapshots to shared memory.")
+    parser.add_argument("--name", default=BUS_NAME or "nifty", help="Segment name readers set as NOM_SNAPBUS")
+    parser.add_argument("--security-id", type=int, default=13)
+    parser.add_argument("--segment", default="IDX_I")
+    parser.add_argument("--expiry", help="YYYY-MM-DD (default: nearest listed)")
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=512, help="Max strikes per snapshot")
+    args = parser.parse_args(argv)
+    publish_forever(args.name, args.security_id, args.segment, args.expiry, args.slots, args.capacity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Embedded analytical store for per-strike chain history.
+
+Snapshots are queued and written in batches by one background thread into
+SQLite (WAL mode, so queries never block ingest). Per-strike rows are
+clustered on (security, strike, time), which is the shape of most questions
+("PE OI at 24,000 over the last 10 sessions"); secondary indexes cover day
+and expiry scans. A per-snapshot summary table (spot, walls, totals) keeps
+day- and expiry-level aggregates off the big table.
+
+The database lives at NOM_STORE (default store/chains.db).
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import downsample
+from bars import IST
+
+STORE_PATH = os.environ.get("NOM_STORE", os.path.join("store", "chains.db"))
+FLUSH_EVERY = 5.0       # Seconds between batch writes
+MIN_SPACING = 5.0       # Snapshots of one chain closer than this are dropped
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    security_id INTEGER NOT NULL,
+    ts          REAL    NOT NULL,
+    day         TEXT    NOT NULL,
+    expiry      TEXT    NOT NULL,
+    spot        REAL,
+    call_wall   REAL,
+    put_wall    REAL,
+    ce_oi       INTEGER,
+    pe_oi       INTEGER,
+    PRIMARY KEY (security_id, ts, expiry)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshots_day ON snapshots (day, security_id);
+CREATE INDEX IF NOT EXISTS snapshots_expiry ON snapshots (expiry, ts);
+
+CREATE TABLE IF NOT EXISTS strikes (
+    security_id INTEGER NOT NULL,
+    strike      REAL    NOT NULL,
+    ts          REAL    NOT NULL,
+    expiry      TEXT    NOT NULL,
+    day         TEXT    NOT NULL,
+    ce_oi       INTEGER,
+    pe_oi       INTEGER,
+    ce_oi_chg   INTEGER,
+    pe_oi_chg   INTEGER,
+    ce_volume   INTEGER,
+    pe_volume   INTEGER,
+    ce_ltp      REAL,
+    pe_ltp      REAL,
+    ce_iv       REAL,
+    pe_iv       REAL,
+    PRIMARY KEY (security_id, strike, ts, expiry)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS strikes_day ON strikes (day, security_id);
+CREATE INDEX IF NOT EXISTS strikes_expiry ON strikes (expiry, ts);
+"""
+
+STRIKE_COLUMNS = ("ce_oi", "pe_oi", "ce_oi_chg", "pe_oi_chg", "ce_volume", "pe_volume",
+                  "ce_ltp", "pe_ltp", "ce_iv", "pe_iv")
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ChainStore:
+    def __init__(self, path=STORE_PATH, flush_every=FLUSH_EVERY, min_spacing=MIN_SPACING):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self.min_spacing = min_spacing
+        self.rows_written = 0
+        self.last_error = None
+        self._last_ts = {}              # (security_id, expiry) -> last accepted ts
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._local = threading.local()
+
+        with _connect(path) as conn:
+            conn.executescript(SCHEMA)
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------------------------
+    # INGEST
+    # ---------------------------------------------------------
+    def add(self, snap, security_id, ts=None, walls=(0, 0)):
+        """Queues one ChainSnapshot; returns False if it was dropped as too close to the last one."""
+        ts = time.time() if ts is None else float(ts)
+        key = (int(security_id), str(snap.expiry or ""))
+        with self._lock:
+            if ts - self._last_ts.get(key, -np.inf) < self.min_spacing:
+                return False
+            self._last_ts[key] = ts
+        day = datetime.fromtimestamp(ts, IST).strftime("%Y-%m-%d")
+        summary = (key[0], ts, day, key[1], snap.ltp, walls[0], walls[1],
+                   int(snap.ce_oi.sum()), int(snap.pe_oi.sum()))
+        # Columns are copied: the snapshot may be a view onto shared memory
+        columns = [getattr(snap, name).copy() for name in ("ce_oi", "pe_oi", "ce_oi_chg", "pe_oi_chg",
+                                                           "ce_volume", "pe_volume")]
+        columns += [snap.ce_ltp.copy(), snap.pe_ltp.copy(), snap.ce_iv.copy(), snap.pe_iv.copy()]
+        self._queue.put((summary, snap.strikes.copy(), columns))
+        return True
+
+    def _writer(self):
+        conn = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_every
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, batch)
+            except sqlite3.Error as e:
+                self.last_error = str(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, conn, batch):
+        snapshots, strikes = [], []
+        for summary, strike_arr, columns in batch:
+            security_id, ts, day, expiry = summary[:4]
+            snapshots.append(summary)
+            n = len(strike_arr)
+            ints = [c.astype(np.int64).tolist() for c in columns[:6]]
+            floats = [c.tolist() for c in columns[6:]]
+            strikes.extend(zip([security_id] * n, strike_arr.tolist(), [ts] * n, [expiry] * n, [day] * n,
+                               *ints, *floats))
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO snapshots VALUES (?,?,?,?,?,?,?,?,?)", snapshots)
+            conn.executemany(f"INSERT OR REPLACE INTO strikes VALUES ({','.join('?' * 15)})", strikes)
+        self.rows_written += len(strikes)
+
+    def flush(self):
+        """Blocks until everything queued so far is written (for scripts and backfills)."""
+        self._queue.join()
+
+    # ---------------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def query(self, sql, params=()):
+        """Any read-only SQL as a DataFrame."""
+        return pd.read_sql_query(sql, self._conn(), params=params)
+
+    def days(self, security_id, limit=None):
+        """Distinct trading days on record, newest first."""
+        sql = "SELECT DISTINCT day FROM snapshots WHERE security_id = ? ORDER BY day DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [r[0] for r in self._conn().execute(sql, (int(security_id),))]
+
+    def strike_history(self, security_id, strike, sessions=10, columns=("ce_oi", "pe_oi"), expiry=None):
+        """Per-poll values at one strike over the last `sessions` trading days."""
+        days = self.days(security_id, sessions)
+        if not days:
+            return pd.DataFrame(columns=["Time", *columns])
+        cols = ", ".join(c for c in columns if c in STRIKE_COLUMNS)
+        sql = (f"SELECT ts, expiry, {cols} FROM strikes WHERE security_id = ? AND strike = ? AND ts >= ?"
+               + (" AND expiry = ?" if expiry else "") + " ORDER BY ts")
+        start = IST.localize(datetime.strptime(days[-1], "%Y-%m-%d")).timestamp()
+        params = (int(security_id), float(strike), start) + ((expiry,) if expiry else ())
+        df = self.query(sql, params)
+        df.insert(0, "Time", pd.to_datetime(df.pop("ts"), unit="s", utc=True).dt.tz_convert(IST))
+        return df
+
+    def daily_strike(self, security_id, strike, sessions=10):
+        """Close-of-day OI and the day's OI change at one strike, one row per session."""
+        return self.query("""
+            SELECT day, expiry,
+                   MAX(CASE WHEN rn_last = 1 THEN ce_oi END) AS ce_oi,
+                   MAX(CASE WHEN rn_last = 1 THEN pe_oi END) AS pe_oi,
+                   MAX(CASE WHEN rn_last = 1 THEN ce_oi END) - MAX(CASE WHEN rn_first = 1 THEN ce_oi END) AS ce_chg,
+                   MAX(CASE WHEN rn_last = 1 THEN pe_oi END) - MAX(CASE WHEN rn_first = 1 THEN pe_oi END) AS pe_chg
+            FROM (
+                SELECT day, expiry, ce_oi, pe_oi,
+                       ROW_NUMBER() OVER (PARTITION BY day, expiry ORDER BY ts DESC) AS rn_last,
+                       ROW_NUMBER() OVER (PARTITION BY day, expiry ORDER BY ts) AS rn_first
+                FROM strikes WHERE security_id = ? AND strike = ?
+            )
+            GROUP BY day, expiry ORDER BY day DESC LIMIT ?""", (int(security_id), float(strike), int(sessions)))
+
+    def wall_holds(self, security_id, expiry_days_only=True):
+        """
+        Per day: the put/call wall at the first snapshot, the day's spot range,
+        and whether spot closed on the right side of each wall.
+        """
+        df = self.query("""
+            SELECT day, expiry,
+                   MIN(spot) AS low, MAX(spot) AS high,
+                   (SELECT spot FROM snapshots s2 WHERE s2.security_id = s.security_id AND s2.day = s.day
+                        AND s2.expiry = s.expiry ORDER BY ts DESC LIMIT 1) AS close,
+                   (SELECT put_wall FROM snapshots s2 WHERE s2.security_id = s.security_id AND s2.day = s.day
+                        AND s2.expiry = s.expiry ORDER BY ts LIMIT 1) AS put_wall,
+                   (SELECT call_wall FROM snapshots s2 WHERE s2.security_id = s.security_id AND s2.day = s.day
+                        AND s2.expiry = s.expiry ORDER BY ts LIMIT 1) AS call_wall
+            FROM snapshots s WHERE security_id = ?
+            GROUP BY day, expiry ORDER BY day DESC""", (int(security_id),))
+        if expiry_days_only:
+            df = df[df["day"] == df["expiry"]]
+        df["put_held"] = df["close"] >= df["put_wall"]
+        df["call_held"] = df["close"] <= df["call_wall"]
+        df["put_touched"] = df["low"] <= df["put_wall"]
+        df["call_touched"] = df["high"] >= df["call_wall"]
+        return df.reset_index(drop=True)
+
+    def stats(self):
+        conn = self._conn()
+        snaps, days = conn.execute("SELECT COUNT(*), COUNT(DISTINCT day) FROM snapshots").fetchone()
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {"snapshots": snaps, "days": days, "mb": size / 1e6, "queued": self._queue.qsize()}
+
+
+# One store (and one writer thread) per process, shared by every session
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=STORE_PATH):
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChainStore(path)
+            atexit.register(_store.flush)
+        return _store
+
+
+def render_panel(st, security_id, default_strike=None, key="store"):
+    """History tab: per-strike OI across sessions and expiry-day wall holds."""
+    store = get_store()
+    s = store.stats()
+    st.caption(f"{s['snapshots']:,} snapshots over {s['days']} sessions, {s['mb']:.1f} MB"
+               + (f", {s['queued']} queued" if s['queued'] else ""))
+    if not s["snapshots"]:
+        return
+
+    c1, c2 = st.columns(2)
+    strike = c1.number_input("Strike", value=float(default_strike or 0), step=50.0, key=f"{key}_strike")
+    sessions = c2.slider("Sessions", 1, 60, 10, key=f"{key}_sessions")
+    start = time.perf_counter()
+    daily = store.daily_strike(security_id, strike, sessions)
+    history = store.strike_history(security_id, strike, sessions)
+    holds = store.wall_holds(security_id)
+    elapsed = time.perf_counter() - start
+
+    if not history.empty:
+        st.line_chart(downsample.downsample_frame(history, "Time", ["ce_oi", "pe_oi"]), x="Time")
+    st.dataframe(daily, use_container_width=True)
+
+    if len(holds):
+        h1, h2 = st.columns(2)
+        h1.metric("Put wall held on expiry", f"{holds['put_held'].mean():.0%}", f"{len(holds)} expiries")
+        h2.metric("Call wall held on expiry", f"{holds['call_held'].mean():.0%}")
+        st.dataframe(holds, use_container_width=True)
+    st.caption(f"Queries took {elapsed * 1000:.0f} ms")
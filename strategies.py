@@ -0,0 +1,249 @@
+"""
+Strategy registry over a shared per-snapshot feature layer.
+
+`Features` wraps one chain snapshot plus the bar history and memoises every
+derived input (ATM index, windowed OI sums, EMA/RSI per timeframe, walls), so
+a feature requested by several strategies is computed once. Strategies are
+plain functions registered with `@register("name")` that read from it and
+return a result dict with at least "signal" and "color". Signal ladders
+live in *.rules files (see rules.py).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import iv_surface
+import logic
+import montecarlo
+import payoff
+from rules import CONSTANTS, RuleSet
+
+STRATEGIES = {}
+RULES_DIR = os.path.dirname(os.path.abspath(__file__))
+NET_OI_WIDTHS = tuple(range(1, 16))     # ATM±w windows shown in the net-OI profile
+
+BUILDUP_LABELS = {
+    CONSTANTS["NEUTRAL"]: "Neutral",
+    CONSTANTS["LONG_BUILDUP"]: "Long Buildup (Strong) 🐂",
+    CONSTANTS["SHORT_COVERING"]: "Short Covering (Weak) 👻",
+    CONSTANTS["SHORT_BUILDUP"]: "Short Buildup (Strong) 🐻",
+    CONSTANTS["LONG_UNWINDING"]: "Long Unwinding (Weak) 📉",
+}
+
+
+def register(name):
+    def wrap(fn):
+        STRATEGIES[name] = fn
+        return fn
+    return wrap
+
+
+def load_rules(name):
+    return RuleSet.from_file(os.path.join(RULES_DIR, f"{name}.rules"))
+
+
+def classify_buildup(price_chg, net_oi):
+    """Vectorised price/OI buildup codes (rules.CONSTANTS)."""
+    price_chg = np.asarray(price_chg, dtype=float)
+    net_oi = np.asarray(net_oi, dtype=float)
+    return np.select(
+        [(price_chg > 0) & (net_oi > 0), (price_chg > 0) & (net_oi < 0),
+         (price_chg < 0) & (net_oi < 0), (price_chg < 0) & (net_oi > 0)],
+        [CONSTANTS["LONG_BUILDUP"], CONSTANTS["SHORT_COVERING"],
+         CONSTANTS["SHORT_BUILDUP"], CONSTANTS["LONG_UNWINDING"]],
+        CONSTANTS["NEUTRAL"])
+
+
+def calculate_rsi(series, period=14):
+    delta = series.diff()
+    gain = (delta.where(delta > 0, 0)).ewm(alpha=1/period, adjust=False).mean()
+    loss = (-delta.where(delta < 0, 0)).ewm(alpha=1/period, adjust=False).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+class Features:
+    """
+    Lazily computed, cached features for one snapshot.
+
+    chain    -- chain.ChainSnapshot
+    bars     -- bars.BarAggregator (optional, needed for EMA/RSI)
+    context  -- extra per-session inputs, e.g. net_diff_history
+    """
+
+    def __init__(self, chain, bars=None, **context):
+        self.chain = chain
+        self.bars = bars
+        self.context = context
+        self.ltp = chain.ltp
+        self._cache = {}
+
+    def _memo(self, key, fn):
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    @property
+    def atm_idx(self):
+        return self._memo("atm_idx", lambda: self.chain.atm_idx)
+
+    def net_oi(self, width):
+        """PE minus CE OI change (vs previous_oi) over ATM±width."""
+        return self._memo(("net_oi", width), lambda: float(self.chain.net_oi(width, self.atm_idx)))
+
+    def net_oi_profile(self, widths=NET_OI_WIDTHS):
+        """Flat and distance-weighted net OI for a family of ATM window widths."""
+        def compute():
+            widths_ = np.asarray(widths)
+            return pd.DataFrame({
+                "Width": widths_,
+                "Net OI": self.chain.net_oi(widths_, self.atm_idx),
+                "Weighted Net OI": self.chain.weighted_net_oi(widths_, self.atm_idx),
+            })
+        return self._memo(("net_oi_profile", tuple(widths)), compute)
+
+    def closes(self, timeframe):
+        return self._memo(("closes", timeframe), lambda: self.bars.closes(timeframe))
+
+    def ema(self, span, timeframe):
+        return self._memo(("ema", span, timeframe),
+                          lambda: float(self.closes(timeframe).ewm(span=span, adjust=False).mean().iloc[-1]))
+
+    def rsi(self, period, timeframe):
+        return self._memo(("rsi", period, timeframe),
+                          lambda: float(calculate_rsi(self.closes(timeframe), period).iloc[-1]))
+
+    def price_change(self, timeframe):
+        def compute():
+            closes = self.closes(timeframe)
+            return float(closes.iloc[-1] - closes.iloc[-2]) if len(closes) > 1 else 0.0
+        return self._memo(("price_chg", timeframe), compute)
+
+    @property
+    def walls(self):
+        """(call wall, put wall): strikes with the highest CE / PE OI."""
+        def compute():
+            c = self.chain
+            if not len(c): return 0, 0
+            res = float(c.strikes[c.ce_oi.argmax()]) if c.ce_oi.max() > 0 else 0
+            sup = float(c.strikes[c.pe_oi.argmax()]) if c.pe_oi.max() > 0 else 0
+            return res, sup
+        return self._memo("walls", compute)
+
+    @property
+    def max_pain(self):
+        """Settlement strike that minimises the intrinsic value paid to option holders."""
+        def compute():
+            c = self.chain
+            if not len(c): return 0
+            k = c.strikes
+            pain = ((c.ce_oi * np.maximum(k[:, None] - k, 0)).sum(axis=1)
+                    + (c.pe_oi * np.maximum(k - k[:, None], 0)).sum(axis=1))
+            return float(k[pain.argmin()])
+        return self._memo("max_pain", compute)
+
+    def wall_odds(self, paths=montecarlo.PATHS):
+        """Monte Carlo touch / close-beyond odds for the walls and max pain (None without an expiry)."""
+        def compute():
+            if not self.chain.expiry or not len(self.chain): return None
+            res, sup = self.walls
+            t = iv_surface.year_fraction(self.chain.expiry)
+            return montecarlo.simulate(self.ltp, payoff.atm_iv(self.chain), t,
+                                       {"Call Wall": res, "Put Wall": sup, "Max Pain": self.max_pain}, paths)
+        return self._memo(("wall_odds", paths), compute)
+
+
+def evaluate(features, names=None, params=None):
+    """Runs the named (default: all) strategies against one feature set."""
+    params = params or {}
+    names = STRATEGIES.keys() if names is None else names
+    return {name: STRATEGIES[name](features, **params.get(name, {})) for name in names}
+
+
+# ---------------------------------------------------------
+# STRATEGIES
+# ---------------------------------------------------------
+@register("delta_oi")
+def delta_oi(f, k=3):
+    """logic.find_signal: delta band + opposite OI change, scored over the whole chain."""
+    c = f.chain
+    call_score, put_score = logic.score_legs(
+        c.ce_delta, c.pe_delta, c.ce_oi_chg, c.pe_oi_chg,
+        c.ce_volume, c.pe_volume, c.ce_iv, c.pe_iv)
+    near = logic.near_atm(c.strikes, f.ltp)
+    call_score = np.where(near, call_score, -np.inf)
+    put_score = np.where(near, put_score, -np.inf)
+    calls = logic.top_k(c.strikes, call_score, k)
+    puts = logic.top_k(c.strikes, put_score, k)
+
+    if calls:
+        return {"signal": "BUY CALL", "color": "green", "strike": calls[0][0], "calls": calls, "puts": puts}
+    if puts:
+        return {"signal": "BUY PUT", "color": "red", "strike": puts[0][0], "calls": calls, "puts": puts}
+    return {"signal": "NO TRADE", "color": "gray", "strike": None, "calls": calls, "puts": puts}
+
+
+MOMENTUM_RULES = load_rules("momentum")
+GAMMA_RULES = load_rules("gamma_scalp")
+
+
+@register("momentum")
+def momentum(f, span=9, timeframe=3, width=5, lookback=3, rules=None):
+    """app.py: EMA-9 trend + slope of net OI diff over the last `lookback` polls."""
+    net_diff = f.net_oi(width)
+    ema = f.ema(span, timeframe)
+    trend = "BULLISH" if f.ltp > ema else "BEARISH"
+
+    history = f.context.get("net_diff_history", [])
+    oi_slope = net_diff - history[-lookback] if len(history) >= lookback else 0
+
+    signal, color = (rules or MOMENTUM_RULES).evaluate({
+        "ltp": np.array([f.ltp]), "ema": np.array([ema]),
+        "net_diff": np.array([net_diff]), "oi_slope": np.array([oi_slope]),
+    })
+
+    return {
+        "signal": signal, "color": color, "ema": ema, "trend_label": trend,
+        "net_diff": net_diff, "oi_slope": oi_slope,
+    }
+
+
+@register("gamma_scalp")
+def gamma_scalp(f, span=5, timeframe=1, rsi_period=14, width=3, touch_prob=0.5, wall_distance=20,
+                odds=False, rules=None):
+    """
+    app_good.py: EMA-5 / RSI / OI buildup, with gamma-wall proximity. With
+    `odds` (opt-in: a full Monte Carlo run per snapshot) a wall is "near" when
+    its touch probability to expiry reaches `touch_prob`; otherwise, or
+    without an expiry, when spot is within `wall_distance`.
+    """
+    ltp = f.ltp
+    ema = f.ema(span, timeframe)
+    rsi = f.rsi(rsi_period, timeframe)
+    net_oi_chg = f.net_oi(width)
+    price_chg = f.price_change(timeframe)
+    buildup = classify_buildup([price_chg], [net_oi_chg])
+
+    signal, color = (rules or GAMMA_RULES).evaluate({
+        "ltp": np.array([ltp]), "ema": np.array([ema]), "rsi": np.array([rsi]),
+        "buildup": buildup, "net_oi": np.array([net_oi_chg]), "price_chg": np.array([price_chg]),
+    })
+
+    res, sup = f.walls
+    odds = f.wall_odds() if odds else None
+    gamma_msg = "Safe Zone"
+    if odds is None:
+        if abs(ltp - res) < wall_distance: gamma_msg = f"⚠️ Near Call Wall ({res})"
+        if abs(ltp - sup) < wall_distance: gamma_msg = f"⚠️ Near Put Wall ({sup})"
+    else:
+        touch = dict(zip(odds["levels"]["Level"], odds["levels"]["P(touch)"]))
+        p_res, p_sup = touch.get("Call Wall", 0), touch.get("Put Wall", 0)
+        if p_res >= touch_prob: gamma_msg = f"⚠️ Near Call Wall ({res}): {p_res:.0%} touch odds"
+        if p_sup >= touch_prob and p_sup >= p_res: gamma_msg = f"⚠️ Near Put Wall ({sup}): {p_sup:.0%} touch odds"
+
+    return {
+        "signal": signal, "color": color, "ema": ema, "rsi": rsi,
+        "buildup": BUILDUP_LABELS[int(buildup[0])], "gamma": gamma_msg, "res": res, "sup": sup,
+        "max_pain": f.max_pain, "wall_odds": odds,
+    }
@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from alerts import AlertDispatcher, SignalTracker, WebhookSink
+
+
+class _Sink(BaseHTTPRequestHandler):
+    """Local stand-in for a webhook; records bodies, optionally slowly."""
+    received = []
+    delay = 0.0
+
+    def do_POST(self):
+        time.sleep(self.delay)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).received.append(json.loads(body))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    handler = type("Handler", (_Sink,), {"received": [], "delay": 0.0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_address[1]}/hook"
+    server.shutdown()
+    server.server_close()
+
+
+def test_webhook_delivery(webhook):
+    handler, url = webhook
+    dispatcher = AlertDispatcher([WebhookSink(url)])
+    dispatcher.publish({"time": 1.0, "signal": "STRONG BUY", "previous": "WAIT", "ltp": 24500})
+    dispatcher.join()
+
+    assert dispatcher.sent == 1 and dispatcher.failed == 0
+    assert handler.received[0]["signal"] == "STRONG BUY"
+    assert handler.received[0]["text"] == "STRONG BUY (was WAIT) ltp=24500"
+
+
+def test_slow_sink_does_not_block_publish(webhook):
+    handler, url = webhook
+    handler.delay = 0.3
+    dispatcher = AlertDispatcher([WebhookSink(url)])
+
+    start = time.perf_counter()
+    for i in range(5):
+        dispatcher.publish({"time": float(i), "signal": "SCALP SELL"})
+    assert time.perf_counter() - start < 0.1
+
+    dispatcher.join()
+    assert len(handler.received) == 5
+
+
+def test_failed_sink_is_counted():
+    dispatcher = AlertDispatcher([WebhookSink("http://127.0.0.1:9/hook", timeout=0.5)], retries=1, backoff=0)
+    dispatcher.publish({"time": 1.0, "signal": "STRONG BUY"})
+    dispatcher.join()
+    assert dispatcher.failed == 1 and dispatcher.sent == 0
+
+
+def test_debounce_needs_consecutive_refreshes():
+    tracker = SignalTracker(debounce=2, cooldown=0)
+    assert tracker.update("STRONG BUY", ts=0) is None
+    assert tracker.update("WAIT", ts=1) is None                # Streak broken
+    assert tracker.update("STRONG BUY", ts=2) is None
+    event = tracker.update("STRONG BUY", ts=3)
+    assert event["signal"] == "STRONG BUY"
+    assert tracker.update("STRONG BUY", ts=4) is None          # Already current
+
+
+def test_cooldown_suppresses_flip_flop_repeats():
+    tracker = SignalTracker(debounce=1, cooldown=300)
+    assert tracker.update("STRONG BUY", ts=0)["signal"] == "STRONG BUY"
+    assert tracker.update("WAIT", ts=10) is None               # Not actionable
+    assert tracker.update("STRONG BUY", ts=20) is None         # Within cooldown
+    assert tracker.update("WAIT", ts=30) is None
+    assert tracker.update("STRONG BUY", ts=400)["previous"] == "WAIT"
+
+
+def test_default_debounce_filters_single_refresh_blips():
+    tracker = SignalTracker()
+    assert tracker.debounce >= 2
+    assert tracker.update("STRONG SELL", ts=0) is None
@@ -0,0 +1,37 @@
+import numpy as np
+
+from anomaly import OIFlowDetector
+from chain import LEG_FIELDS, ChainSnapshot
+
+STRIKES = np.arange(30) * 50.0 + 24000
+
+
+def _snap(rng, level, expiry):
+    columns = {f"{side}_{f}": level + rng.normal(0, 1000, len(STRIKES)).cumsum()
+               for side in ("ce", "pe") for f in LEG_FIELDS}
+    return ChainSnapshot(STRIKES, None, columns, 24700, expiry)
+
+
+def test_switching_chain_resets_instead_of_bursting():
+    rng = np.random.default_rng(0)
+    det = OIFlowDetector()
+    for i in range(40):
+        det.update(1000 + 15 * i, _snap(rng, 1e6 + 100 * i, "2026-10-22"), key=("13", "2026-10-22"))
+
+    # Same strikes, unrelated chain: OI levels jump by millions
+    events = det.update(1600, _snap(rng, 5e6, "2026-10-29"), key=("13", "2026-10-29"))
+    assert events == [] and not det.events
+    assert det.key == ("13", "2026-10-29")
+
+
+def test_burst_detected_on_same_chain():
+    rng = np.random.default_rng(1)
+    det = OIFlowDetector()
+    level = np.full(len(STRIKES), 1e6)
+    for i in range(60):
+        level = level + rng.normal(0, 5000, len(STRIKES))
+        columns = {f"{side}_{f}": level.copy() for side in ("ce", "pe") for f in LEG_FIELDS}
+        if i == 59:
+            columns["pe_oi"][10] += 80000
+        events = det.update(1000 + 15 * i, ChainSnapshot(STRIKES, None, columns, 24700, "2026-10-22"))
+    assert any(e["strike"] == STRIKES[10] and e["series"] == "PE OI" and e["kind"] == "burst" for e in events)
@@ -0,0 +1,17 @@
+import numpy as np
+
+from logic import _pct_rank, score_legs
+
+
+def test_pct_rank_ties_share_average_rank():
+    assert np.allclose(_pct_rank(np.zeros(5)), 0.5)
+    assert np.allclose(_pct_rank(np.array([3.0, 1.0, 2.0, 1.0])), [1.0, 1 / 6, 2 / 3, 1 / 6])
+
+
+def test_constant_columns_do_not_bias_by_strike_position():
+    n = 7
+    delta = np.full(n, 0.5)
+    oi = np.ones(n)
+    flat = np.zeros(n)
+    call_score, _ = score_legs(delta, -delta, oi, -oi, flat, flat, flat, flat)
+    assert np.allclose(call_score, call_score[0])
@@ -0,0 +1,43 @@
+import numpy as np
+
+import payoff
+from chain import LEG_FIELDS, ChainSnapshot
+from iv_surface import bs_price
+
+STRIKES = np.arange(24000, 25450, 50.0)
+SPOT, T, VOL = 24700, 5 / 365, 0.13
+WALLS = (25000, 24400)
+
+
+def _snap(bump=None):
+    columns = {f"{side}_{f}": np.zeros(len(STRIKES)) for side in ("ce", "pe") for f in LEG_FIELDS}
+    columns["ce_ltp"] = bs_price(SPOT, STRIKES, T, VOL, True)
+    columns["pe_ltp"] = bs_price(SPOT, STRIKES, T, VOL, False)
+    columns["ce_iv"][:] = columns["pe_iv"][:] = VOL * 100
+    if bump:
+        series, strike, factor = bump
+        columns[series][np.searchsorted(STRIKES, strike)] *= factor
+    return ChainSnapshot(STRIKES, None, columns, SPOT, "2026-10-23")
+
+
+def _top_leg_qty(snap, strike, is_call):
+    table, best = payoff.rank(payoff.candidates(snap, WALLS), snap, T)
+    leg = (best.strike[0] == strike) & (best.is_call[0] == is_call)
+    return table, best.qty[0][leg].sum()
+
+
+def test_fair_chain_does_not_favour_long_premium():
+    table, _ = payoff.rank(payoff.candidates(_snap(), WALLS), _snap(), T)
+    assert np.isfinite(table["Max Profit"]).all()
+    assert not table["Structure"][0].startswith("Long")
+    assert abs(table["Score"][0]) < 0.01     # No edge at fair prices
+
+
+def test_cheap_call_is_bought():
+    table, qty = _top_leg_qty(_snap(("ce_ltp", 24800, 0.9)), 24800, True)
+    assert qty > 0 and table["Score"][0] > 0.1
+
+
+def test_rich_put_is_sold():
+    table, qty = _top_leg_qty(_snap(("pe_ltp", 24600, 1.1)), 24600, False)
+    assert qty < 0 and table["Score"][0] > 0.1
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from resilient import RateLimiter, ResilientFetcher
+
+
+def _upstream(delays):
+    """Fake endpoint recording call times; the i-th call sleeps delays[i] (default 50 ms)."""
+    calls = []
+    start = time.monotonic()
+
+    def call(*args):
+        calls.append(time.monotonic() - start)
+        time.sleep(delays[len(calls) - 1] if len(calls) <= len(delays) else 0.05)
+        return {"status": "success"}
+    return call, calls
+
+
+def test_queued_calls_are_not_hedged():
+    fn, calls = _upstream([])
+    fetcher = ResilientFetcher("queued", fn, limiter=RateLimiter(0.5))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetcher.fetch(1))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 3
+    assert all(r["source"] == "primary" and not r["stale"] for r in results)
+
+
+def test_slow_call_is_hedged_after_spacing():
+    fn, calls = _upstream([3.0])
+    fetcher = ResilientFetcher("slow", fn, limiter=RateLimiter(0.5))
+    result = fetcher.fetch(1)
+
+    assert result["source"] == "hedge"
+    assert len(calls) == 2 and calls[1] >= 0.5